@@ -0,0 +1,65 @@
+"""
+Decoding a /content response: parsing the body twice with json (as
+before), once with api.loads() (orjson if installed), and pulling just
+one subtree out of it with ijson, if installed. Pass a recorded response
+body to use it instead of a synthetic one of about the same shape. Run
+from the top directory:
+
+    python -m benchmarks.decode [<content.json> [<path>]]
+"""
+
+import io
+import json
+import sys
+import timeit
+
+from habitica import api
+
+
+def synthetic():
+    """A /content-like response body of about 0.6MB."""
+    def entries(prefix, count, **extra):
+        return dict(('%s%d' % (prefix, i),
+                     dict({'key': '%s%d' % (prefix, i),
+                           'text': 'The %s number %d' % (prefix, i),
+                           'notes': 'Lorem ipsum dolor sit amet. ' * 4,
+                           'value': i}, **extra))
+                    for i in range(count))
+    data = {'gear': {'flat': entries('armor_', 2000, str=1, con=2)},
+            'quests': entries('quest_', 300, boss={'hp': 500, 'str': 1}),
+            'eggs': entries('egg_', 100),
+            'hatchingPotions': entries('potion_', 100),
+            'food': entries('food_', 100),
+            'spells': {'wizard': entries('spell_', 50)}}
+    return json.dumps({'success': True, 'data': data}).encode('utf-8')
+
+
+def main(source=None, path='quests'):
+    if source:
+        with open(source, 'rb') as f:
+            body = f.read()
+    else:
+        body = synthetic()
+    print('%.1f MB body, subtree data.%s' % (len(body) / 1e6, path))
+    cases = [
+        ('json.loads twice', lambda: (json.loads(body), json.loads(body))),
+        ('json.loads once', lambda: json.loads(body)),
+        ('api.loads (%s)' % ('orjson' if api.optional('orjson') else
+                             'json'),
+         lambda: api.loads(body)),
+        ('api.loads + subtree',
+         lambda: api.subtree(api.loads(body)['data'], path)),
+    ]
+    ijson = api.optional('ijson')
+    if ijson is not None:
+        cases.append(('ijson subtree (%s)' % ijson.backend,
+                      lambda: next(ijson.items(io.BytesIO(body),
+                                               'data.' + path,
+                                               use_float=True))))
+    for label, decode in cases:
+        seconds = min(timeit.repeat(decode, number=5, repeat=3)) / 5
+        print('%-28s %7.1f ms' % (label, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
@@ -0,0 +1,37 @@
+"""
+Microbenchmark of building requests: the time api.Habitica takes to turn
+a call into a request dict (URL, headers, parameters), per 100k calls.
+Run from the top directory:
+
+    python -m benchmarks.routes [<calls>]
+"""
+
+import sys
+import timeit
+
+from habitica import api
+
+AUTH = {'url': 'https://habitica.com', 'x-api-user': 'bench-user',
+        'x-api-key': 'key'}
+TASK = '0e5b0c3f-8ad1-4c2d-9a7e-6f3b2a1c9d0e'
+
+
+def main(count=100000):
+    hbt = api.Habitica(auth=dict(AUTH))
+    cases = (
+        ('route() template', lambda: api.route(AUTH['url'], 'tasks', TASK,
+                                               2) % ('score', 'up')),
+        ('hbt.tasks.user(type=...)',
+         lambda: hbt.tasks.user._prepare({'type': 'todos'})),
+        ('hbt.tasks(_id, _one, _two)',
+         lambda: hbt.tasks._prepare({'_id': TASK, '_one': 'score',
+                                     '_two': 'up', '_method': 'post'})),
+    )
+    for label, build in cases:
+        seconds = min(timeit.repeat(build, number=count, repeat=5))
+        print('%-28s %6.3fs per %d, %5.2f us each'
+              % (label, seconds, count, seconds / count * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,46 @@
+"""
+Requests per second through api.Habitica against the stub server on
+localhost, with the pooled keep-alive session and with a connection per
+request, as before it. Run from the top directory:
+
+    python -m benchmarks.session [<requests>]
+"""
+
+import sys
+import time
+
+from habitica import api
+from habitica.core import run_concurrently
+from tests.stub import StubServer
+
+
+def rate(server, count, keep_alive=True, workers=1):
+    """Requests per second for count GET user requests."""
+    user = 'bench-user'
+    auth = {'url': server.url, 'x-api-user': user, 'x-api-key': 'key'}
+    hbt = api.Habitica(auth=auth,
+                       session=api.make_session(pool_size=workers,
+                                                keep_alive=keep_alive))
+    # measure the client, not the pacing
+    api._limiters[user] = api.RateLimiter(limit=count + 1)
+    started = time.perf_counter()
+    results = run_concurrently([hbt.user] * count, workers)
+    elapsed = time.perf_counter() - started
+    errors = [error for result, error in results if error is not None]
+    if errors:
+        raise errors[0]
+    return count / elapsed
+
+
+def main(count=500):
+    with StubServer() as server:
+        for label, keep_alive, workers in (
+                ('new connection each', False, 1),
+                ('pooled keep-alive', True, 1),
+                ('pooled keep-alive, 4 workers', True, 4)):
+            print('%-30s %7.0f requests/s'
+                  % (label, rate(server, count, keep_alive, workers)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
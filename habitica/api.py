@@ -9,93 +9,755 @@ http://github.com/philadams/habitica
 """
 
 
+from datetime import datetime
+import importlib
 import json
+import random
+import re
+import threading
+import time
 
-import requests
+# requests, and the optional aiohttp, ijson and orjson, are only imported
+# once they are needed, to keep `import habitica` (and so every CLI
+# start-up) cheap
 
 API_URI_BASE = 'api/v3'
 API_CONTENT_TYPE = 'application/json'
+API_POOL_SIZE = 10  # connections kept alive per host
+API_TIMEOUT = (5, 30)  # (connect, read) seconds
+API_RATE_LIMIT = 30  # requests per API_RATE_PERIOD, per user
+API_RATE_PERIOD = 60.0  # seconds
+API_RETRIES = 4  # times to retry a request that failed transiently
+API_BACKOFF_BASE = 0.5  # seconds before the first retry, doubling after
+API_BACKOFF_MAX = 30.0  # longest wait before a retry, Retry-After included
+API_CIRCUIT_FAILURES = 5  # transient failures in a row that open the circuit
+API_CIRCUIT_COOLDOWN = 30.0  # seconds an open circuit fails requests fast
+HTTP_OK = 200
+HTTP_CREATED = 201
+HTTP_TOO_MANY_REQUESTS = 429
+HTTP_BAD_GATEWAY = 502
+HTTP_SERVICE_UNAVAILABLE = 503
+HTTP_GATEWAY_TIMEOUT = 504
+HTTP_SUCCESS = (HTTP_OK, HTTP_CREATED)
+# the server (or a proxy in front of it) is down or overloaded
+HTTP_UNAVAILABLE = (HTTP_BAD_GATEWAY, HTTP_SERVICE_UNAVAILABLE,
+                    HTTP_GATEWAY_TIMEOUT)
 
+_session = None
+_session_options = {}
+writes = 0  # non-GET requests sent so far, to tell when cached state is stale
+_optional = {}
+_limiters = {}
+_limiters_lock = threading.Lock()
+_circuits = {}
+_routes = {}
+# callables each handed a dict describing every request sent, see record()
+hooks = []
+UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                  r'[0-9a-f]{12}$')
 
-class Habitica(object):
+
+def __getattr__(name):
+    # keeps api.requests (e.g. api.requests.exceptions) working
+    if name == 'requests':
+        return importlib.import_module('requests')
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def optional(name):
+    """Import an optional module on first use; None if it isn't installed."""
+    if name not in _optional:
+        try:
+            _optional[name] = importlib.import_module(name)
+        except ImportError:
+            _optional[name] = None
+    return _optional[name]
+
+
+def make_session(pool_size=API_POOL_SIZE, keep_alive=True):
+    """Build a requests.Session with a connection pool of `pool_size`."""
+    import requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_session():
+    """Return the module-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = make_session(**_session_options)
+    return _session
+
+
+def configure(pool_size=API_POOL_SIZE, keep_alive=True, timeout=API_TIMEOUT):
     """
-    A minimalist Habitica API class.
+    Set up the module-wide session and default timeout. The session itself
+    is (re)built on first use.
+    """
+    global _session, API_TIMEOUT
+    if _session is not None:
+        _session.close()
+        _session = None
+    _session_options.update(pool_size=pool_size, keep_alive=keep_alive)
+    API_TIMEOUT = timeout
+
+
+def parse_rate_reset(value, now=None):
+    """
+    Turn an X-RateLimit-Reset or Retry-After header into an epoch time.
+    Accepts seconds from now, epoch seconds/milliseconds, or the
+    JavaScript Date string Habitica sends ('Thu Apr 16 2020 12:00:00
+    GMT+0000 (Coordinated Universal Time)'). Returns None if unparsable.
+    """
+    now = time.time() if now is None else now
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        pass
+    else:
+        if seconds > 1e11:
+            return seconds / 1000.0
+        if seconds > 1e9:
+            return seconds
+        return now + seconds
+    try:
+        text = re.sub(r'\s*\(.*\)$', '', value.strip())
+        return datetime.strptime(text, '%a %b %d %Y %H:%M:%S GMT%z').timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class RateLimiter(object):
+    """
+    Token bucket pacing requests for one user. Without server input it
+    refills continuously at limit/period; once the server has reported
+    X-RateLimit-Remaining/-Reset, the bucket tracks that window instead,
+    so bulk commands go as fast as allowed and no faster.
+    """
+
+    def __init__(self, limit=API_RATE_LIMIT, period=API_RATE_PERIOD):
+        self.lock = threading.Lock()
+        self.limit = float(limit)
+        self.period = float(period)
+        self.tokens = float(limit)
+        self.reset = None
+        self.updated = time.time()
+
+    def _refill(self, now):
+        if self.reset is not None:
+            if now >= self.reset:
+                self.tokens = self.limit
+                self.reset = None
+        else:
+            self.tokens = min(self.limit, self.tokens +
+                              (now - self.updated) * self.limit / self.period)
+        self.updated = now
+
+    def reserve(self):
+        """
+        Take a token and return 0 if one is free; otherwise return how
+        many seconds to wait before asking again.
+        """
+        with self.lock:
+            now = time.time()
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            if self.reset is not None:
+                wait = self.reset - now
+            else:
+                wait = (1 - self.tokens) * self.period / self.limit
+            return max(wait, 0.01)
+
+    def acquire(self):
+        """Block until a request may be sent, then take a token."""
+        wait = self.reserve()
+        while wait:
+            time.sleep(wait)
+            wait = self.reserve()
+
+    def update(self, headers):
+        """Sync the bucket with the server's X-RateLimit-* headers."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        with self.lock:
+            now = time.time()
+            self._refill(now)
+            limit = headers.get('X-RateLimit-Limit')
+            if limit is not None:
+                self.limit = float(limit)
+            # requests still in flight already took their token, so
+            # never hand out more than the server says is left
+            self.tokens = min(self.tokens, float(remaining))
+            reset = parse_rate_reset(headers.get('X-RateLimit-Reset'), now)
+            if reset is not None and reset > now:
+                self.reset = reset
+
+    def throttled(self, headers, cap=None):
+        """
+        The server answered 429: stop sending until it resets, unless
+        that's more than cap seconds away. Returns whether it will wait.
+        """
+        with self.lock:
+            now = time.time()
+            reset = parse_rate_reset(headers.get('Retry-After'), now) or \
+                parse_rate_reset(headers.get('X-RateLimit-Reset'), now) or \
+                now + self.period / self.limit
+            if cap is not None and reset - now > cap:
+                return False
+            self.tokens = 0
+            self.reset = max(reset, now)
+            self.updated = now
+            return True
+
+
+def get_limiter(user):
+    """Return the RateLimiter shared by all requests made as user."""
+    with _limiters_lock:
+        if user not in _limiters:
+            _limiters[user] = RateLimiter()
+        return _limiters[user]
+
+
+class CircuitOpenError(IOError):
+    """Raised instead of sending a request while the server looks down."""
+
+
+class CircuitBreaker(object):
+    """
+    Fails requests to one server fast while it looks down: after
+    `failures` transient failures in a row (connection errors, timeouts,
+    502/503/504) the circuit opens, and requests raise CircuitOpenError
+    for `cooldown` seconds. Then one request at a time is let through to
+    probe the server; any answer from it closes the circuit again.
+    """
+
+    def __init__(self, failures=API_CIRCUIT_FAILURES,
+                 cooldown=API_CIRCUIT_COOLDOWN):
+        self.lock = threading.Lock()
+        self.failures = failures
+        self.cooldown = cooldown
+        self.count = 0
+        self.opened = None
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self.lock:
+            if self.opened is None:
+                return
+            now = time.time()
+            if now - self.opened < self.cooldown:
+                raise CircuitOpenError('Server unavailable, not retrying for '
+                                       '%.0f seconds' % (self.opened +
+                                                         self.cooldown - now))
+            # let this request probe, the others wait for its outcome
+            self.opened = now
+
+    def success(self):
+        with self.lock:
+            self.count = 0
+            self.opened = None
+
+    def failure(self):
+        with self.lock:
+            self.count += 1
+            if self.count >= self.failures:
+                self.opened = time.time()
+
+
+def get_circuit(url):
+    """Return the CircuitBreaker shared by all requests to the server url."""
+    with _limiters_lock:
+        if url not in _circuits:
+            _circuits[url] = CircuitBreaker()
+        return _circuits[url]
+
+
+def backoff(attempt, headers=None, now=None):
+    """
+    Seconds to wait before retry number attempt (from 0): what the
+    server asked for in Retry-After, or else a random share of an
+    exponentially growing delay, so clients that failed together don't
+    retry together. None if the server wants longer than API_BACKOFF_MAX.
+    """
+    now = time.time() if now is None else now
+    retry_after = (headers or {}).get('Retry-After')
+    if retry_after is not None:
+        reset = parse_rate_reset(retry_after, now)
+        if reset is not None:
+            wait = max(reset - now, 0)
+            return wait if wait <= API_BACKOFF_MAX else None
+    return random.uniform(0, min(API_BACKOFF_MAX,
+                                 API_BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_status(method, status, attempt):
+    """
+    Whether a request answered with status should be sent again. A 429
+    or 503 means the server didn't act on it; after a 502/504 only
+    requests that are safe to repeat (not POSTs) are retried.
+    """
+    if attempt >= API_RETRIES:
+        return False
+    if status in (HTTP_TOO_MANY_REQUESTS, HTTP_SERVICE_UNAVAILABLE):
+        return True
+    return status in HTTP_UNAVAILABLE and method != 'post'
+
+
+def unsent(error):
+    """Whether a request that raised error never reached the server."""
+    requests = importlib.import_module('requests')
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, importlib.import_module(
+        'urllib3.exceptions').NewConnectionError)
+
+
+def raise_for_status(res):
+    """Raise requests' HTTPError for a response that isn't HTTP_SUCCESS."""
+    res.raise_for_status()
+    raise importlib.import_module('requests').exceptions.HTTPError(
+        '%s %s for url: %s' % (res.status_code, res.reason, res.url),
+        response=res)
+
+
+def endpoint(request):
+    """
+    The endpoint a request dict went to, by its route() shape so requests
+    can be grouped: an id as aspect becomes ':id' and every path argument
+    ':arg', e.g. 'tasks/:id/:arg/:arg' for scoring a task.
+    """
+    resource, aspect, count = request['route']
+    parts = [resource]
+    if aspect:
+        parts.append(':id' if UUID.match(aspect) else aspect)
+    return '/'.join(parts + [':arg'] * count)
+
+
+def record(request, started, error=None):
+    """
+    Hand every hook a dict about the finished request: method, endpoint,
+    status (None if no answer came), bytes of body (None if unknown),
+    latency and decode time in seconds, retries, and the error class
+    name if it failed. started is the time.perf_counter() it began at.
+    """
+    latency = time.perf_counter() - started
+    entry = {'time': time.time() - latency,
+             'method': request['method'].upper(),
+             'endpoint': endpoint(request),
+             'status': request.get('status'),
+             'bytes': request.get('bytes'),
+             'latency': latency,
+             'retries': request['retries'],
+             'decode': request.get('decode', 0.0),
+             'error': type(error).__name__ if error is not None else None}
+    for hook in list(hooks):
+        hook(entry)
+
+
+def loads(body):
+    """Decode a JSON response body, with orjson when it is installed."""
+    return (optional('orjson') or json).loads(body)
+
+
+def subtree(doc, path):
+    """Follow a dotted key path such as 'items.pets' down into doc."""
+    for key in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def route(url, resource, aspect, count):
+    """
+    URL template for resource (and aspect) followed by count path
+    arguments, built once per shape and then served from _routes.
+    """
+    key = (url, resource, aspect, count)
+    template = _routes.get(key)
+    if template is None:
+        parts = [url, API_URI_BASE, resource]
+        if aspect:
+            parts.append(aspect)
+        parts = [part.replace('%', '%%') for part in parts]
+        template = _routes[key] = '/'.join(parts + ['%s'] * count)
+    return template
+
+
+class HabiticaBase(object):
     """
+    URL building and response decoding shared by Habitica and
+    AsyncHabitica, which only differ in how requests are sent.
 
-    def __init__(self, auth=None, resource=None, aspect=None):
-        self.auth = auth
-        self.resource = resource
-        self.aspect = aspect
-        self.headers = auth if auth else {}
-        self.headers.update({'content-type': API_CONTENT_TYPE})
+    Instances are immutable endpoint handles: attribute access hands out
+    (and remembers) child handles that share this one's header dict.
+    """
+
+    __slots__ = ('auth', 'resource', 'aspect', 'session', 'timeout',
+                 'headers', 'children')
+
+    def __init__(self, auth=None, resource=None, aspect=None, session=None,
+                 timeout=None):
+        headers = auth if auth else {}
+        headers.update({'content-type': API_CONTENT_TYPE})
+        self._set(auth, resource, aspect, session, timeout, headers)
+
+    def _set(self, auth, resource, aspect, session, timeout, headers):
+        for name, value in (('auth', auth), ('resource', resource),
+                            ('aspect', aspect), ('session', session),
+                            ('timeout', timeout), ('headers', headers),
+                            ('children', {})):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s handles are read-only"
+                             % type(self).__name__)
 
     def __getattr__(self, m):
-        try:
-            return object.__getattr__(self, m)
-        except AttributeError:
+        if m.startswith('__'):
+            raise AttributeError(m)
+        child = self.children.get(m)
+        if child is None:
+            child = object.__new__(type(self))
             if not self.resource:
-                return Habitica(auth=self.auth, resource=m)
+                child._set(self.auth, m, None, self.session, self.timeout,
+                           self.headers)
             else:
-                return Habitica(auth=self.auth, resource=self.resource,
-                                aspect=m)
+                child._set(self.auth, self.resource, m, self.session,
+                           self.timeout, self.headers)
+            self.children[m] = child
+        return child
 
-    def __call__(self, **kwargs):
+    def _prepare(self, kwargs):
+        """Turn the keyword arguments of a call into a request dict."""
         method = kwargs.pop('_method', 'get')
+        # _params: query string for put/post, which send kwargs as body
+        params = kwargs.pop('_params', None)
+        timeout = kwargs.pop('_timeout', self.timeout or API_TIMEOUT)
+        # _data: send this as the JSON body instead of the other kwargs
+        body = kwargs.pop('_data', None)
+        # _headers: extra request headers, e.g. for conditional requests
+        # _response: hand back the raw response instead of its data
+        headers = kwargs.pop('_headers', None)
+        raw = kwargs.pop('_response', False)
+        # _path: only return this dotted subtree of the data, e.g.
+        # 'items.pets'; parsed incrementally when ijson is installed
+        path = kwargs.pop('_path', None)
 
-        # build up URL... Habitica's api is the *teeniest* bit annoying
-        # so either i need to find a cleaner way here, or i should
-        # get involved in the API itself and... help it.
-        if self.aspect:
-            aspect_id = kwargs.pop('_id', None)
-            direction = kwargs.pop('_direction', None)
-            if aspect_id is not None:
-                uri = '%s/%s/%s/%s/%s' % (self.auth['url'],
-                                          API_URI_BASE,
-                                          self.resource,
-                                          self.aspect,
-                                          str(aspect_id))
-            arg_one = kwargs.pop('_one', None)
-            arg_two = kwargs.pop('_two', None)
-            uri = '%s/%s' % (self.auth['url'], API_URI_BASE)
-            if arg_one is not None:
-                uri += '/%s/%s/%s' % (self.resource, self.aspect,
-                                      str(arg_one))
-            else:
-                uri = '%s/%s/%s/%s' % (self.auth['url'],
-                                       API_URI_BASE,
-                                       self.resource,
-                                       self.aspect)
-            if direction is not None:
-                uri = '%s/%s' % (uri, direction)
-                uri += '/%s/%s' % (self.resource, self.aspect)
-            if arg_two is not None:
-                uri = '%s/%s' % (uri, arg_two)
+        # path arguments, in URL order: resource/aspect/_one/_direction/_two
+        # (_id is the older name of _one)
+        args = []
+        for name in ('_id', '_one', '_direction', '_two'):
+            value = kwargs.pop(name, None)
+            if value is not None:
+                args.append(str(value))
+        uri = route(self.auth['url'], self.resource, self.aspect,
+                    len(args)) % tuple(args)
+        if headers:
+            extra, headers = headers, dict(self.headers)
+            headers.update(extra)
         else:
-            uri = '%s/%s/%s' % (self.auth['url'],
-                                API_URI_BASE,
-                                self.resource)
-        #print(uri)
-        # actually make the request of the API
+            headers = self.headers
+
+        request = {'method': method, 'uri': uri, 'headers': headers,
+                   'timeout': timeout, 'raw': raw, 'data': None,
+                   'path': path, 'retries': 0,
+                   'route': (self.resource, self.aspect, len(args)),
+                   'stream': bool(path) and not raw and
+                   optional('ijson') is not None}
         if method in ['put', 'post'] and self.aspect \
                 not in ['class', 'inventory']:
-            if not self.aspect == None and 'batch-update' in self.aspect:
-                data = json.dumps(kwargs.pop('ops', []))
+            if body is not None:
+                request['data'] = json.dumps(body)
+            elif self.aspect is not None and 'batch-update' in self.aspect:
+                request['data'] = json.dumps(kwargs.pop('ops', []))
             else:
-                data = json.dumps(kwargs)
-            #print(data)
-            res = getattr(requests, method)(uri, headers=self.headers,
-                                            data=data)
+                request['data'] = json.dumps(kwargs)
+            request['params'] = params
         else:
-            # from ipdb import set_trace; set_trace()
-            res = getattr(requests, method)(uri, headers=self.headers,
-                                            params=kwargs)
-
-        # print(res.url)  # debug...
-        if res.status_code == requests.codes.ok or requests.codes.created:
-            if "data" in res.json():
-                return res.json()["data"]
-            else:
+            request['params'] = kwargs
+        return request
+
+    def _guards(self, request):
+        """
+        The RateLimiter of this user and the CircuitBreaker of the server
+        to send request through; counts it in writes if it changes data.
+        """
+        global writes
+        if request['method'] != 'get':
+            writes += 1
+        return (get_limiter(self.headers.get('x-api-user')),
+                get_circuit(self.auth['url']))
+
+    def _retry(self, request, attempt, guards, status=None, headers=None,
+               sent=True):
+        """
+        What to do after try number attempt (from 0) of request: answered
+        with status and headers, or failed to connect (no status; sent is
+        whether it may have reached the server anyway). Tells the guards
+        the outcome, and returns how many seconds to wait before trying
+        again, or None to stop there.
+
+        Transient failures are retried up to API_RETRIES times after
+        backoff(), but a POST that may have got through is never sent
+        twice; a 429 waits for the limiter, if that's no longer than
+        API_BACKOFF_MAX.
+        """
+        limiter, circuit = guards
+        if status is None:
+            circuit.failure()
+            if attempt >= API_RETRIES or (request['method'] == 'post' and
+                                          sent):
                 return None
+            return backoff(attempt)
+        if status in HTTP_UNAVAILABLE:
+            circuit.failure()
+        else:
+            circuit.success()
+        if not retry_status(request['method'], status, attempt):
+            limiter.update(headers)
+            return None
+        if status == HTTP_TOO_MANY_REQUESTS:
+            # the limiter waits, unless that's too long to bother
+            return 0 if limiter.throttled(headers, API_BACKOFF_MAX) else None
+        return backoff(attempt, headers)
+
+    def _decode(self, payload, path=None):
+        """Pick the data (or its subtree at path) out of a decoded response."""
+        if "data" in payload:
+            if path:
+                return subtree(payload["data"], path)
+            return payload["data"]
+        else:
+            return None
+
+
+class Habitica(HabiticaBase):
+    """
+    A minimalist Habitica API class.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, auth=None, resource=None, aspect=None, session=None,
+                 timeout=None):
+        # without a session of its own, the module-wide one is used
+        HabiticaBase.__init__(self, auth=auth, resource=resource,
+                              aspect=aspect, session=session,
+                              timeout=timeout)
+
+    def __call__(self, **kwargs):
+        request = self._prepare(kwargs)
+        if not hooks:
+            return self._call(request)
+        started = time.perf_counter()
+        try:
+            data = self._call(request)
+        except Exception as e:
+            record(request, started, e)
+            raise
+        record(request, started)
+        return data
+
+    def _call(self, request):
+        # actually make the request of the API
+        res = self._request(request)
+        request['status'] = res.status_code
+        if request['raw'] or request['stream']:
+            length = res.headers.get('Content-Length')
+            request['bytes'] = int(length) if length else None
+        if request['raw']:
+            return res
+        if res.status_code not in HTTP_SUCCESS:
+            raise_for_status(res)
+
+        started = time.perf_counter()
+        if request['stream']:
+            # pull just the wanted subtree out of the body as it arrives
+            with res:
+                res.raw.decode_content = True
+                data = next(optional('ijson').items(
+                    res.raw, 'data.' + request['path'], use_float=True), None)
+        else:
+            request['bytes'] = len(res.content)
+            data = self._decode(loads(res.content), request['path'])
+        request['decode'] = time.perf_counter() - started
+        return data
+
+    def _request(self, request):
+        """
+        Send one request, paced by this user's RateLimiter and guarded by
+        the server's CircuitBreaker, retrying as _retry() decides.
+        """
+        requests = importlib.import_module('requests')
+        guards = limiter, circuit = self._guards(request)
+        session = self.session or get_session()
+        attempt = 0
+        while True:
+            circuit.check()
+            limiter.acquire()
+            try:
+                res = getattr(session, request['method'])(
+                    request['uri'], headers=request['headers'],
+                    params=request['params'], data=request['data'],
+                    timeout=request['timeout'], stream=request['stream'])
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as e:
+                wait = self._retry(request, attempt, guards,
+                                   sent=not unsent(e))
+                if wait is None:
+                    raise
+            else:
+                wait = self._retry(request, attempt, guards,
+                                   res.status_code, res.headers)
+                if wait is None:
+                    return res
+                res.close()
+            time.sleep(wait)
+            attempt += 1
+            request['retries'] = attempt
+
+
+class AsyncPool(object):
+    """An aiohttp ClientSession, opened on first use and shared by children."""
+
+    __slots__ = ('pool_size', 'keep_alive', 'client')
+
+    def __init__(self, pool_size=API_POOL_SIZE, keep_alive=True):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.client = None
+
+    def get(self):
+        if self.client is None or self.client.closed:
+            aiohttp = optional('aiohttp')
+            connector = aiohttp.TCPConnector(limit=self.pool_size,
+                                             force_close=not self.keep_alive)
+            self.client = aiohttp.ClientSession(connector=connector)
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+
+class AsyncHabitica(HabiticaBase):
+    """
+    Asyncio version of Habitica, on a pooled aiohttp session. Attribute
+    access builds URLs exactly like Habitica does, calls are awaited:
+
+        async with AsyncHabitica(auth=auth) as hbt:
+            user, todos = await asyncio.gather(
+                hbt.user(), hbt.tasks.user(type='todos'))
+
+    Needs aiohttp (pip install habitica[async]).
+    """
+
+    __slots__ = ()
+
+    def __init__(self, auth=None, resource=None, aspect=None, session=None,
+                 timeout=None):
+        if optional('aiohttp') is None:
+            raise ImportError('AsyncHabitica needs aiohttp installed')
+        HabiticaBase.__init__(self, auth=auth, resource=resource,
+                              aspect=aspect,
+                              session=session if session else AsyncPool(),
+                              timeout=timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    async def close(self):
+        await self.session.close()
+
+    async def __call__(self, **kwargs):
+        request = self._prepare(kwargs)
+        if not hooks:
+            return await self._call(request)
+        started = time.perf_counter()
+        try:
+            data = await self._call(request)
+        except Exception as e:
+            record(request, started, e)
+            raise
+        record(request, started)
+        return data
+
+    async def _call(self, request):
+        res = await self._request(request)
+        request['status'] = res.status
+        if request['raw']:
+            # the caller reads (and releases) the aiohttp response
+            request['bytes'] = res.content_length
+            return res
+        try:
+            if res.status not in HTTP_SUCCESS:
+                res.raise_for_status()
+                raise optional('aiohttp').ClientResponseError(
+                    res.request_info, res.history, status=res.status,
+                    message=res.reason, headers=res.headers)
+            body = await res.read()
+        finally:
+            res.release()
+        request['bytes'] = len(body)
+        started = time.perf_counter()
+        data = self._decode(loads(body), request['path'])
+        request['decode'] = time.perf_counter() - started
+        return data
+
+    async def _request(self, request):
+        """Send one request, with the same pacing and retries as Habitica."""
+        import asyncio
+        aiohttp = optional('aiohttp')
+        guards = limiter, circuit = self._guards(request)
+        timeout = request['timeout']
+        if isinstance(timeout, tuple):
+            timeout = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                            sock_read=timeout[1])
         else:
-            print(res.url)
-            res.raise_for_status()
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        # aiohttp only takes str/int/float query values
+        params = dict((k, v if isinstance(v, (str, int, float))
+                       and not isinstance(v, bool) else str(v))
+                      for k, v in (request['params'] or {}).items())
+        attempt = 0
+        while True:
+            circuit.check()
+            wait = limiter.reserve()
+            while wait:
+                await asyncio.sleep(wait)
+                wait = limiter.reserve()
+            try:
+                res = await self.session.get().request(
+                    request['method'].upper(), request['uri'],
+                    headers=request['headers'], params=params,
+                    data=request['data'], timeout=timeout)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                wait = self._retry(
+                    request, attempt, guards,
+                    sent=not isinstance(e, aiohttp.ClientConnectorError))
+                if wait is None:
+                    raise
+            else:
+                wait = self._retry(request, attempt, guards, res.status,
+                                   res.headers)
+                if wait is None:
+                    return res
+                res.release()
+            await asyncio.sleep(wait)
+            attempt += 1
+            request['retries'] = attempt
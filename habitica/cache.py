@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Local caches for the habitica command-line interface.
+http://github.com/philadams/habitica
+"""
+
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+
+from .api import loads
+
+try:
+    import ConfigParser as configparser
+except:
+    import configparser
+
+CONTENT_MAX_AGE = 3600  # seconds before /content is revalidated
+CONTENT_META = 'meta.json'
+SECTION_TASKS_SYNCED = 'TasksSynced'  # <user>/<type>: last sync time
+SECTION_TASKS_SHOWN = 'TasksShown'  # <user>/<type>: ids as last listed
+SECTION_TASKS_CRON = 'TasksNeedsCron'  # <user>: needsCron and when seen
+SECTION_OUTBOX_CLAIM = 'OutboxClaim'  # <user>: pid flushing the outbox
+OUTBOX_CLAIM_TTL = 300  # seconds a flush may hold on to its claim
+
+
+def write_atomic(path, data):
+    """Write bytes data to path via a temporary file and a rename."""
+    # one temporary file per writer, threads of one process included
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ContentCache(object):
+    """
+    Habitica's /content game data, kept on disk as one gzipped JSON
+    file per top-level key. Looking up content.quests only decompresses
+    and parses the quests, never the whole multi-megabyte document.
+
+    The download is revalidated with If-None-Match/If-Modified-Since
+    once it is older than max_age, at most once per max_age seconds for
+    a long-running process.
+    """
+
+    def __init__(self, hbt, path, max_age=CONTENT_MAX_AGE):
+        self.hbt = hbt
+        self.path = path
+        self.max_age = max_age
+        self.sections = {}
+        self.meta = None
+        self.checked = 0
+        # accounts run on threads of their own share one ContentCache
+        self.lock = threading.Lock()
+
+    def _load_meta(self):
+        if self.meta is None:
+            try:
+                with open(os.path.join(self.path, CONTENT_META)) as f:
+                    self.meta = json.load(f)
+            except (IOError, ValueError):
+                self.meta = {}
+        return self.meta
+
+    def _save_meta(self):
+        write_atomic(os.path.join(self.path, CONTENT_META),
+                     json.dumps(self.meta).encode('utf-8'))
+
+    def refresh(self, force=False):
+        """Revalidate against the server, downloading only if changed."""
+        with self.lock:
+            self._refresh(force)
+
+    def _refresh(self, force):
+        meta = self._load_meta()
+        self.checked = time()
+        if not force and meta.get('keys') and \
+                time() - meta.get('fetched', 0) < self.max_age:
+            return
+
+        headers = {}
+        if meta.get('keys') and not force:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last-modified'):
+                headers['If-Modified-Since'] = meta['last-modified']
+        res = self.hbt.content(_headers=headers, _response=True)
+        if res.status_code == 304:
+            logging.debug('Cached content is still current')
+            meta['fetched'] = time()
+            self._save_meta()
+            return
+        res.raise_for_status()
+
+        logging.info('Caching content in %s...' % self.path)
+        content = loads(res.content)['data']
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        for key, value in content.items():
+            write_atomic(os.path.join(self.path, '%s.json.gz' % key),
+                         gzip.compress(json.dumps(value).encode('utf-8')))
+        self.sections = content
+        self.meta = {'etag': res.headers.get('ETag'),
+                     'last-modified': res.headers.get('Last-Modified'),
+                     'fetched': time(),
+                     'keys': sorted(content)}
+        self._save_meta()
+
+    def stale(self):
+        return time() - self.checked >= self.max_age
+
+    def keys(self):
+        if self.stale():
+            self.refresh()
+        return self._load_meta().get('keys', [])
+
+    def __getitem__(self, key):
+        if self.stale():
+            self.refresh()
+        if key not in self.sections:
+            if key not in self.keys():
+                raise KeyError(key)
+            with gzip.open(os.path.join(self.path, '%s.json.gz' % key)) as f:
+                self.sections[key] = loads(f.read())
+        return self.sections[key]
+
+    def __getattr__(self, key):
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def all(self):
+        """The whole content document, as hbt.content() would return it."""
+        return dict((key, self[key]) for key in self.keys())
+
+
+class CacheStore(object):
+    """
+    Sectioned key/value cache kept in an sqlite database.
+
+    set() upserts a single entry, optionally expiring ttl seconds later;
+    writes stay in one transaction until commit() (or the end of a
+    `with store:` block), and sqlite makes each commit atomic. An old
+    configparser cache file passed as legacy is imported on first use
+    and renamed to <legacy>.migrated.
+    """
+
+    def __init__(self, path, legacy=None):
+        self.path = path
+        self.lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                        'section TEXT, key TEXT, value TEXT, expires REAL, '
+                        'PRIMARY KEY (section, key))')
+        self.db.commit()
+        if legacy and os.path.exists(legacy):
+            self.migrate(legacy)
+
+    def migrate(self, legacy):
+        """Import a configparser cache file, then move it out of the way."""
+        logging.info('Migrating cache data from %s to %s...'
+                     % (legacy, self.path))
+        config = configparser.RawConfigParser()
+        config.read(legacy)
+        with self:
+            for section in config.sections():
+                entries = dict(config.items(section))
+                # guild names used to share one timestamp for a week
+                expires = None
+                if 'timestamp' in entries:
+                    expires = float(entries.pop('timestamp')) + 604800
+                for key, value in entries.items():
+                    self.db.execute('INSERT OR REPLACE INTO cache '
+                                    'VALUES (?, ?, ?, ?)',
+                                    (section, key, value, expires))
+        os.rename(legacy, legacy + '.migrated')
+
+    def get(self, section, key, default=None):
+        """Return the unexpired value stored under section/key."""
+        with self.lock:
+            row = self.db.execute('SELECT value, expires FROM cache '
+                                  'WHERE section = ? AND key = ?',
+                                  (section, key)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time()):
+            return default
+        return row[0]
+
+    def items(self, section):
+        """Return all unexpired (key, value) pairs of section."""
+        with self.lock:
+            rows = self.db.execute('SELECT key, value FROM cache '
+                                   'WHERE section = ? AND (expires IS NULL '
+                                   'OR expires >= ?)',
+                                   (section, time())).fetchall()
+        return rows
+
+    def set(self, section, key, value, ttl=None):
+        """Upsert section/key; it expires after ttl seconds if given."""
+        expires = time() + ttl if ttl is not None else None
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                            (section, key, value, expires))
+
+    def update(self, section, ttl=None, **kwargs):
+        for key, value in kwargs.items():
+            self.set(section, key, value, ttl=ttl)
+
+    def delete(self, section, key=None):
+        """Drop section/key, or the whole section if key is None."""
+        with self.lock:
+            if key is None:
+                self.db.execute('DELETE FROM cache WHERE section = ?',
+                                (section,))
+            else:
+                self.db.execute('DELETE FROM cache '
+                                'WHERE section = ? AND key = ?',
+                                (section, key))
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.db.commit()
+            else:
+                self.db.rollback()
+        finally:
+            self.lock.release()
+
+
+class TaskStore(object):
+    """
+    The user's task lists, kept in a CacheStore's database so listings can
+    be shown without waiting for the server: one row per (user, task id)
+    with the task as JSON, its place in the server's list and its
+    updatedAt stamp, which sync() compares to rewrite only changed tasks.
+
+    The ids of the list as it was last shown are kept as well, so that
+    <task-id> numbers keep pointing at what the user saw, and whether the
+    user needs cron, which the dailies listing mentions.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        with store:
+            store.db.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                             'user TEXT, id TEXT, type TEXT, rank INTEGER, '
+                             'updated TEXT, doc TEXT, PRIMARY KEY (user, id))')
+
+    def tasks(self, user, task_type):
+        """The stored task_type list, or None if it was never synced."""
+        key = '%s/%s' % (user, task_type)
+        with self.store.lock:
+            if self.store.get(SECTION_TASKS_SYNCED, key) is None:
+                return None
+            rows = self.store.db.execute('SELECT doc FROM tasks '
+                                         'WHERE user = ? AND type = ? '
+                                         'ORDER BY rank',
+                                         (user, task_type)).fetchall()
+        return [loads(doc) for (doc,) in rows]
+
+    def synced(self, user, task_type):
+        """When the task_type list was last synced, or None."""
+        value = self.store.get(SECTION_TASKS_SYNCED,
+                               '%s/%s' % (user, task_type))
+        return float(value) if value is not None else None
+
+    def sync(self, user, task_type, tasks, force=False):
+        """
+        Make the stored task_type list match tasks, writing only the tasks
+        whose updatedAt changed (or all of them, with force). Returns how
+        many tasks were written or dropped.
+        """
+        changed = 0
+        with self.store:
+            known = dict((row[0], row[1:]) for row in self.store.db.execute(
+                'SELECT id, updated, rank FROM tasks '
+                'WHERE user = ? AND type = ?', (user, task_type)))
+            for rank, task in enumerate(tasks):
+                updated = task.get('updatedAt')
+                if force or task['id'] not in known or \
+                        known[task['id']][0] != updated:
+                    self.store.db.execute('INSERT OR REPLACE INTO tasks '
+                                          'VALUES (?, ?, ?, ?, ?, ?)',
+                                          (user, task['id'], task_type, rank,
+                                           updated, json.dumps(task)))
+                    changed += 1
+                elif known[task['id']][1] != rank:
+                    self.store.db.execute('UPDATE tasks SET rank = ? '
+                                          'WHERE user = ? AND id = ?',
+                                          (rank, user, task['id']))
+            gone = set(known) - set(task['id'] for task in tasks)
+            for tid in gone:
+                self.store.db.execute('DELETE FROM tasks '
+                                      'WHERE user = ? AND id = ?',
+                                      (user, tid))
+            self.store.set(SECTION_TASKS_SYNCED, '%s/%s' % (user, task_type),
+                           str(time()))
+        return changed + len(gone)
+
+    def shown(self, user, task_type):
+        """Ids of the task_type list as last shown, or None."""
+        ids = self.store.get(SECTION_TASKS_SHOWN, '%s/%s' % (user, task_type))
+        return json.loads(ids) if ids is not None else None
+
+    def show(self, user, task_type, tasks):
+        """Remember tasks as the task_type list the user is looking at."""
+        with self.store:
+            self.store.set(SECTION_TASKS_SHOWN, '%s/%s' % (user, task_type),
+                           json.dumps([task.get('id') for task in tasks]))
+
+    def needs_cron(self, user, max_age=None):
+        """
+        The user's needsCron flag as last seen, or None if it never was
+        (or, with max_age, not in the last max_age seconds).
+        """
+        value = self.store.get(SECTION_TASKS_CRON, user)
+        if value is None:
+            return None
+        flag, _, seen = value.partition(' ')
+        if max_age is not None and time() - float(seen or 0) > max_age:
+            return None
+        return flag == '1'
+
+    def set_needs_cron(self, user, value):
+        """Note the user's needsCron flag, which goes with the dailies."""
+        with self.store:
+            self.store.set(SECTION_TASKS_CRON, user,
+                           '%d %s' % (bool(value), time()))
+
+
+class Outbox(object):
+    """
+    Task changes waiting to be sent, kept in order in a CacheStore's
+    database so they outlive the process: one row per batch-update op,
+    with what the op is expected to leave behind (e.g. the task being
+    completed), so a replay can skip ops the server already applied.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        with store:
+            store.db.execute('CREATE TABLE IF NOT EXISTS outbox ('
+                             'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                             'user TEXT, op TEXT, expect TEXT, queued REAL)')
+
+    def put(self, user, entries):
+        """Queue (op, expect) pairs for user, after those already queued."""
+        with self.store:
+            for op, expect in entries:
+                self.store.db.execute('INSERT INTO outbox '
+                                      '(user, op, expect, queued) '
+                                      'VALUES (?, ?, ?, ?)',
+                                      (user, json.dumps(op),
+                                       json.dumps(expect), time()))
+
+    def pending(self, user):
+        """The queued (seq, op, expect) of user, oldest first."""
+        with self.store.lock:
+            rows = self.store.db.execute('SELECT seq, op, expect FROM outbox '
+                                         'WHERE user = ? ORDER BY seq',
+                                         (user,)).fetchall()
+        return [(seq, loads(op), loads(expect)) for seq, op, expect in rows]
+
+    def count(self, user):
+        with self.store.lock:
+            return self.store.db.execute('SELECT COUNT(*) FROM outbox '
+                                         'WHERE user = ?',
+                                         (user,)).fetchone()[0]
+
+    def done(self, seqs):
+        """Drop the given entries, sent or given up on."""
+        with self.store:
+            for seq in seqs:
+                self.store.db.execute('DELETE FROM outbox WHERE seq = ?',
+                                      (seq,))
+
+    def claim(self, user, ttl=OUTBOX_CLAIM_TTL):
+        """
+        Take the right to flush user's outbox for up to ttl seconds, so two
+        processes (or threads) never send the same ops. False if taken.
+        """
+        with self.store:
+            self.store.db.execute('DELETE FROM cache WHERE section = ? '
+                                  'AND key = ? AND expires < ?',
+                                  (SECTION_OUTBOX_CLAIM, user, time()))
+            cursor = self.store.db.execute('INSERT OR IGNORE INTO cache '
+                                           'VALUES (?, ?, ?, ?)',
+                                           (SECTION_OUTBOX_CLAIM, user,
+                                            str(os.getpid()), time() + ttl))
+            return cursor.rowcount == 1
+
+    def release(self, user):
+        with self.store:
+            self.store.delete(SECTION_OUTBOX_CLAIM, user)
@@ -13,28 +13,31 @@ TODO:philadams get logger named, like requests!
 
 
 from bisect import bisect
+import copy
+import io
 import json
 import logging
 import os.path
 import random
 import sys
+import uuid
 from operator import itemgetter
 import re
-from time import sleep, time
-from webbrowser import open_new_tab
+from threading import Lock, Thread, local
+from time import time
 
 from collections import OrderedDict
+from contextlib import redirect_stdout
 import datetime
-import humanize
-import dateutil.parser
-import pytz
 import textwrap
 
 from docopt import docopt
 
 from . import api
+from .cache import CacheStore, ContentCache, Outbox, TaskStore
 
-from pprint import pprint
+# humanize, dateutil, pytz, webbrowser and concurrent.futures are imported
+# where they're used, so commands that don't need them start up faster
 
 try:
     import ConfigParser as configparser
@@ -44,7 +47,7 @@ except:
 
 VERSION = 'habitica version 0.0.16'
 TASK_VALUE_BASE = 0.9747  # http://habitica.wikia.com/wiki/Task_Value
-HABITICA_REQUEST_WAIT_TIME = 0.5  # time to pause between concurrent requests
+HABITICA_REQUEST_WORKERS = 4  # max requests in flight for bulk commands
 HABITICA_TASKS_PAGE = '/#/tasks'
 # https://trello.com/c/4C8w1z5h/17-task-difficulty-settings-v2-priority-multiplier
 PRIORITY = {'easy': 1,
@@ -52,18 +55,86 @@ PRIORITY = {'easy': 1,
             'hard': 2}
 AUTH_CONF = os.path.expanduser('~') + '/.config/habitica/auth.cfg'
 CACHE_CONF = os.path.expanduser('~') + '/.config/habitica/cache.cfg'
+CACHE_DB = os.path.expanduser('~') + '/.config/habitica/cache.db'
 SETTINGS_CONF = os.path.expanduser('~') + '/.config/habitica/settings.cfg'
+CONTENT_CACHE = os.path.expanduser('~') + '/.config/habitica/content'
+DAEMON_SOCKET = os.path.expanduser('~') + '/.config/habitica/daemon.sock'
+DAEMON_USER_TTL = 30  # seconds the daemon reuses a fetched user document
+TASKS_FRESH = 30  # seconds a stored task list is shown without a sync
 
 SECTION_HABITICA = 'Habitica'
 SECTION_CACHE_QUEST = 'Quest'
 SECTION_CACHE_GUILDNAMES = 'Guildnames'
-checklists_on = False
+GUILDNAMES_TTL = 604800  # re-fetch cached guild names after a week
+SECTION_CACHE_IMPORT = 'Import'
+IMPORT_BATCH_SIZE = 50  # todos created per request by `todos import`
+IMPORT_TTL = 604800  # forget the checkpoint of an unfinished import after a week
+IMPORT_KEY_LINES = 100  # lines of input hashed into an import's checkpoint key
+SECTION_CACHE_MEMBERS = 'Members'
+MEMBERS_TTL = 60  # seconds a cached member profile counts as fresh
+MEMBERS_STALE = 86400  # seconds a stale profile may be shown while refreshed
+# the only member fields status and quest look at
+MEMBER_FIELDS = ('profile.name', 'preferences.sleep',
+                 'auth.timestamps.loggedin', 'stats.hp', 'stats.maxHealth',
+                 'stats.mp', 'stats.maxMP', 'stats.class')
+# top-level user fields each command reads, sent as userFields= so only
+# those are downloaded; None (or a missing command) fetches the whole user
+USER_DELTA_FIELDS = ('stats', 'balance', 'items')  # what show_delta reads
+USER_FIELDS = {
+    'item': ('items',),
+    'feed': USER_DELTA_FIELDS,
+    'hatch': USER_DELTA_FIELDS,
+    'sell': USER_DELTA_FIELDS,
+    'dump': None,
+    'cast': USER_DELTA_FIELDS + ('profile', 'party'),
+    'gems': USER_DELTA_FIELDS + ('purchased',),
+    'armoire': USER_DELTA_FIELDS,
+    'quest': ('party',),
+    'ride': ('items',),
+    'walk': ('items',),
+    'equip': USER_DELTA_FIELDS,
+    'sleep': ('preferences',),
+    'arise': ('preferences',),
+    'status': ('profile', 'stats', 'balance', 'items', 'preferences',
+               'guilds', 'newMessages', 'party', 'needsCron'),
+    'habits': USER_DELTA_FIELDS,
+    'dailies': USER_DELTA_FIELDS + ('needsCron',),
+    'todos': USER_DELTA_FIELDS,
+    'chat': ('guilds', 'newMessages', 'party', 'profile'),
+    'newday': USER_DELTA_FIELDS + ('needsCron',),
+}
+# per thread, as several accounts may be served at once
+display = local()
+content_cache = None  # the process' ContentCache, see load_content()
+serving = False  # whether this process is `habitica daemon`
+ACCOUNT_DEFAULT = 'default'  # name of the plain [Habitica] auth section
+PROFILE_TOP = 5  # endpoints listed by --profile, slowest first
 
 DEFAULT_PARTY = 'Not currently in a party'
 DEFAULT_QUEST = 'Not currently on a quest'
 DEFAULT_PET = 'No pet currently'
 DEFAULT_MOUNT = 'Not currently mounted'
 
+# food: matching pet/potion kind (seasonal foods carry it in their name)
+FEEDING = {
+            'Saddle':           'ignore',
+            'Meat':             'Base',
+            'CottonCandyBlue':  'CottonCandyBlue',
+            'CottonCandyPink':  'CottonCandyPink',
+            'Honey':            'Golden',
+            'Milk':             'White',
+            'Strawberry':       'Red',
+            'Chocolate':        'Shade',
+            'Fish':             'Skeleton',
+            'Potatoe':          'Desert',
+            'RottenMeat':       'Zombie',
+          }
+# list of kinds of pets/potions (disregarding Magic Potion ones)
+KINDS = [ 'Base', 'CottonCandyBlue', 'CottonCandyPink', 'Golden',
+          'White', 'Red', 'Shade', 'Skeleton', 'Desert', 'Zombie' ]
+# magic potion kinds, whose pets will eat anything
+MAGIC_KINDS = ['Spooky', 'Peppermint', 'Floral', 'Thunderstorm', 'Ghost']
+
 def load_typo_check(config, defaults, section, configfile):
     for item in config.options(section):
         if item not in defaults:
@@ -83,8 +154,15 @@ def load_settings(configfile):
                 'print-width' : "80",
                 'hide-done': "0",
                 'hide-inactive' : "0",
+                'pool-size': "10",
+                'keep-alive': "1",
+                'connect-timeout': "5",
+                'read-timeout': "30",
+                'workers': str(HABITICA_REQUEST_WORKERS),
+                'outbox': "0",
                }
-    strings = { }
+    strings = {'profile-log': "",
+              }
     defaults = integers.copy()
     defaults.update(strings)
 
@@ -105,7 +183,7 @@ def load_settings(configfile):
     return settings
 
 
-def load_auth(configfile):
+def load_auth(configfile, section=SECTION_HABITICA):
     """Get authentication data from the AUTH_CONF file."""
 
     logging.debug('Loading habitica auth data from %s' % configfile)
@@ -131,16 +209,15 @@ def load_auth(configfile):
     # Get data from config
     rv = {}
     try:
-        rv = {'url': config.get('Habitica', 'url'),
-              'checklists': config.get('Habitica', 'checklists'),
-              'x-api-user': config.get('Habitica', 'login'),
-              'x-api-key': config.get('Habitica', 'password')}
+        rv = {'url': config.get(section, 'url'),
+              'checklists': config.get(section, 'checklists'),
+              'x-api-user': config.get(section, 'login'),
+              'x-api-key': config.get(section, 'password')}
         for item in mapping:
-            rv[mapping[item]] = config.get(SECTION_HABITICA, item)
+            rv[mapping[item]] = config.get(section, item)
 
     except configparser.NoSectionError:
-        logging.error("No '%s' section in '%s'" % (SECTION_HABITICA,
-                                                   configfile))
+        logging.error("No '%s' section in '%s'" % (section, configfile))
         exit(1)
 
     except configparser.NoOptionError as e:
@@ -149,56 +226,61 @@ def load_auth(configfile):
         exit(1)
 
     # Do this after checking for the section.
-    load_typo_check(config, mapping, SECTION_HABITICA, configfile)
+    load_typo_check(config, mapping, section, configfile)
 
     # Return auth data as a dictionnary
     return rv
 
 
-def load_cache(configfile):
-    logging.debug('Loading cached config data (%s)...' % configfile)
-
-    defaults = {'quest_key': '',
-                'quest_s': 'Not currently on a quest'}
-
-    cache = configparser.ConfigParser(defaults)
-    cache.read(configfile)
-
-    if not cache.has_section(SECTION_CACHE_QUEST):
-        cache.add_section(SECTION_CACHE_QUEST)
+def load_accounts(configfile):
+    """
+    Get auth data for every account in the AUTH_CONF file, by name: the
+    [Habitica] section is ACCOUNT_DEFAULT, further accounts are kept in
+    [Habitica:<name>] sections.
+    """
+    config = configparser.SafeConfigParser()
+    config.read(configfile)
 
-    if not cache.has_section(SECTION_CACHE_GUILDNAMES):
-        cache.add_section(SECTION_CACHE_GUILDNAMES)
+    accounts = OrderedDict()
+    for section in config.sections():
+        if section == SECTION_HABITICA:
+            accounts[ACCOUNT_DEFAULT] = load_auth(configfile, section)
+        elif section.startswith(SECTION_HABITICA + ':'):
+            name = section.split(':', 1)[1].strip()
+            accounts[name] = load_auth(configfile, section)
+    return accounts
 
-    return cache
 
+def load_cache(dbfile, legacy=CACHE_CONF):
+    """Open the cache store, migrating an old cache.cfg into it."""
+    logging.debug('Loading cached data (%s)...' % dbfile)
+    return CacheStore(dbfile, legacy=legacy)
 
-def update_quest_cache(configfile, **kwargs):
-    logging.debug('Updating (and caching) config data (%s)...' % configfile)
 
-    cache = load_cache(configfile)
+def load_content(hbt):
+    """The ContentCache, kept (and its parsed sections) for the process."""
+    global content_cache
+    if content_cache is None:
+        content_cache = ContentCache(hbt, CONTENT_CACHE)
+    return content_cache
 
-    for key, val in kwargs.items():
-        cache.set(SECTION_CACHE_QUEST, key, val)
 
-    with open(configfile, 'w') as f:
-        cache.write(f)
+def update_quest_cache(cache, quest_key, **kwargs):
+    logging.debug('Updating (and caching) quest data (%s)...' % cache.path)
 
-    cache.read(configfile)
+    # entries are per quest, as accounts in other parties share the cache
+    with cache:
+        for name, value in kwargs.items():
+            cache.set(SECTION_CACHE_QUEST, '%s/%s' % (quest_key, name),
+                      value)
 
     return cache
 
-def update_guildnames_cache(configfile, number, name):
-    logging.debug('Updating (and caching) config data (%s)...' % configfile)
-
-    cache = load_cache(configfile)
+def update_guildnames_cache(cache, number, name):
+    """Cache a guild name; written out by the caller's cache.commit()."""
+    logging.debug('Updating (and caching) guild name (%s)...' % cache.path)
 
-    cache.set(SECTION_CACHE_GUILDNAMES, number, name)
-
-    with open(configfile, 'w') as f:
-        cache.write(f)
-
-    cache.read(configfile)
+    cache.set(SECTION_CACHE_GUILDNAMES, number, name, ttl=GUILDNAMES_TTL)
 
     return cache
 
@@ -225,7 +307,83 @@ def get_task_ids(tids):
                 task_ids.extend(e - 1 for e in result)
             else:
                 task_ids.append(int(bit)-1)
-    return [e for e in set(task_ids)]
+    # drop duplicates, but keep the order the ids were given in
+    seen = set()
+    return [e for e in task_ids if not (e in seen or seen.add(e))]
+
+
+def run_concurrently(calls, workers=HABITICA_REQUEST_WORKERS):
+    """
+    Run each zero-argument callable in calls on a bounded thread pool.
+    Returns a (result, exception) pair per call, in the order of calls.
+    With one worker they run in this thread, one after the other.
+    """
+    results = []
+    workers = min(workers, len(calls))
+    if workers <= 1:
+        for call in calls:
+            try:
+                results.append((call(), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(call) for call in calls]
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as e:
+                results.append((None, e))
+    return results
+
+
+def op_call(auth, op):
+    """
+    The request a user/batch-update op stands for, as a zero-argument
+    callable, for sending ops one by one.
+    """
+    params = op.get('params', {})
+    if op['op'] == 'score':
+        scorer = api.Habitica(auth=auth, resource="tasks", aspect=params['id'])
+        return lambda: scorer(_method='post', _one='score',
+                              _two=params['direction'])
+    if op['op'] == 'scoreChecklistItem':
+        checklist = api.Habitica(auth=auth, resource="tasks",
+                                 aspect=params['taskId'])
+        return lambda: checklist(_method='post', _one='checklist',
+                                 _two=params['itemId'] + '/score')
+    if op['op'] == 'addTask':
+        creator = api.Habitica(auth=auth, resource="tasks", aspect="user")
+        return lambda: creator(_method='post', **op['body'])
+    if op['op'] == 'deleteTask':
+        task = api.Habitica(auth=auth, resource="tasks", aspect=params['id'])
+        return lambda: task(_method='delete')
+    raise ValueError("unknown batch op %s" % op['op'])
+
+
+def is_offline(error):
+    """
+    Whether error means the server couldn't be reached, or is down: a
+    network failure, an open api.CircuitBreaker, or a 502/503/504 that
+    outlasted the retries.
+    """
+    if isinstance(error, api.requests.exceptions.HTTPError):
+        return error.response is not None and \
+            error.response.status_code in api.HTTP_UNAVAILABLE
+    return isinstance(error, (api.requests.exceptions.ConnectionError,
+                              api.requests.exceptions.Timeout,
+                              api.CircuitOpenError))
+
+
+def get_party(hbt):
+    """The user's party, or None if they aren't in one."""
+    try:
+        return hbt.groups.party()
+    except api.requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
 
 
 def nice_name(thing):
@@ -278,6 +436,368 @@ def find_pet_to_feed(pets, items, suffix, finicky):
                 mouth = pet
     return mouth
 
+def plan_feeding(items, feeding=FEEDING):
+    """
+    Work out every feeding possible from one snapshot of the user's
+    items, simulating satiety and food counts locally instead of
+    refetching the user after each pet.
+
+    Returns (plan, foods, unwanted): plan is a list of steps, each a dict
+    with 'pet', 'food', 'bites', satiety 'gain' per bite, and the satiety
+    'before' and 'after';
+    foods is what would be left over, and unwanted the foods we tried
+    but found nobody to feed to.
+    """
+    feeding = dict(feeding)
+    sim = {'pets': dict(items['pets']), 'mounts': dict(items['mounts'])}
+    pets = sim['pets']
+    foods = dict(items['food'])
+
+    magic_pets = [pet for pet in pets if pet.split('-')[1] in MAGIC_KINDS]
+
+    plan = []
+    attempted_foods = set()
+    fed_foods = set()
+    refreshed = True
+    while refreshed:
+        refreshed = False
+        for food in foods:
+            # Handle seasonal foods that encode matching pet in name.
+            if '_' in food:
+                best = food.split('_',1)[1]
+                if not food in feeding:
+                    feeding[food] = best
+
+            # Skip foods we don't have any of.
+            if foods[food] <= 0:
+                continue
+
+            # Find best pet to feed to.
+            suffix = feeding.get(food, None)
+            if suffix == None:
+                print("Unknown food: %s" % (food))
+                continue
+            if suffix == 'ignore':
+                continue
+
+            # Track attempted foods
+            attempted_foods.add(food)
+
+            mouth = find_pet_to_feed(pets, sim, suffix, True)
+
+            # If we have food but its not ideal for pet, give it to a
+            # magic pet which will eat anything.
+            if not mouth:
+                mouth = find_pet_to_feed(magic_pets, sim, suffix, False)
+
+            if mouth:
+                before = pets[mouth]
+
+                # a pet's favorite food, and any food for magic pets, is
+                # worth 5; 50 is "fully fed and now a mount", so never
+                # plan a bite past that
+                gain = 5
+                bites = max(1, (50 - before + gain - 1) // gain)
+                if foods[food] < bites:
+                    bites = foods[food]
+
+                foods[food] -= bites
+                after = before + gain * bites
+                if after >= 50:
+                    after = -1
+                    sim['mounts'][mouth] = True
+                pets[mouth] = after
+
+                fed_foods.add(food)
+                if plan and (plan[-1]['pet'], plan[-1]['food']) == \
+                        (mouth, food):
+                    plan[-1]['bites'] += bites
+                    plan[-1]['after'] = after
+                else:
+                    plan.append({'pet': mouth, 'food': food, 'bites': bites,
+                                 'gain': gain, 'before': before,
+                                 'after': after})
+                refreshed = True
+                break
+
+    return plan, foods, sorted(attempted_foods - fed_foods)
+
+
+def feed_pets(auth, plan):
+    """
+    Carry out a plan from plan_feeding, one request per step using the
+    API's amount parameter. Servers that ignore amount only feed one
+    bite, so any missing bites are then sent one at a time. Returns the
+    pets the server refused to feed.
+    """
+    feeder = api.Habitica(auth=auth, resource="user", aspect="feed")
+    failed = set()
+    for i, step in enumerate(plan):
+        pet, food, bites = step['pet'], step['food'], step['bites']
+        moar = ""
+        if step['after'] > 0 and \
+                not any(later['pet'] == pet for later in plan[i + 1:]):
+            need_bites = (50 - step['after'] + 4) // 5
+            moar = " (needs %d more serving%s)" % (need_bites,
+                    "" if need_bites == 1 else "s")
+        print("Feeding %d %s to %s%s" % (bites, nice_name(food),
+                                       nice_name(pet), moar))
+        try:
+            fed = feeder(_method='post', _one=pet, _two=food,
+                         _params={'amount': bites})
+        except api.requests.exceptions.HTTPError as e:
+            print("Failed to feed %s: %s" % (nice_name(pet), e))
+            failed.add(pet)
+            continue
+        # A server without amount support fed a single bite.
+        if bites > 1 and fed == step['before'] + step['gain']:
+            try:
+                for bite in range(bites - 1):
+                    feeder(_method='post', _one=pet, _two=food)
+            except api.requests.exceptions.HTTPError as e:
+                print("Failed to feed %s: %s" % (nice_name(pet), e))
+                failed.add(pet)
+    return failed
+
+
+def plan_hatching(items, eggs_extra=0, kinds=KINDS):
+    """
+    Pair up eggs and hatching potions from one snapshot of the user's
+    items, tracking egg, potion and pet counts locally as we go.
+
+    Returns (hatches, missing, needs): the (egg, potion) pairs to hatch,
+    the (egg, potion) pairs we lack a potion for, and one
+    (egg, need, report, sell) entry per egg we'd still have afterwards,
+    saying how many to keep and why, and how many can be sold.
+    """
+    pets = dict(items['pets'])
+    mounts = items['mounts']
+    eggs = dict(items['eggs'])
+    potions = dict(items['hatchingPotions'])
+
+    hatches = []
+    missing = []
+    for egg in eggs:
+        for kind in kinds:
+            creature = '%s-%s' % (egg, kind)
+
+            # This pet is already hatched.
+            if pets.get(creature, 0) > 0:
+                continue
+
+            # We ran out of eggs.
+            if eggs[egg] <= 0:
+                break
+
+            # Missing the potion needed for this creature.
+            if potions.get(kind, 0) < 1:
+                missing.append((egg, kind))
+                continue
+
+            hatches.append((egg, kind))
+            eggs[egg] -= 1
+            potions[kind] -= 1
+            pets[creature] = 5
+
+    needs = []
+    for egg in eggs:
+        need_pets = []
+        need_mounts = []
+
+        # Don't bother reporting about eggs we have none of.
+        if eggs[egg] <= 0:
+            continue
+
+        for kind in kinds:
+            creature = '%s-%s' % (egg, kind)
+            if mounts.get(creature, 0) == 0:
+                need_mounts.append(nice_name(kind))
+            if pets.get(creature, 0) < 5:
+                need_pets.append(kind)
+
+        report = ""
+        if len(need_pets):
+            report += "%d Pet%s (%s)" % (len(need_pets),
+                      "" if len(need_pets) == 1 else "s",
+                      ", ".join(need_pets))
+        if len(need_mounts):
+            if len(report):
+                report += ", "
+            report += "%d Mount%s (%s)" % (len(need_mounts),
+                      "" if len(need_mounts) == 1 else "s",
+                      ", ".join(need_mounts))
+        if eggs_extra:
+            if len(report):
+                report += ", "
+            report += "%d extra" % (eggs_extra)
+
+        need = len(need_pets) + len(need_mounts) + eggs_extra
+        needs.append((egg, need, report, max(eggs[egg] - need, 0)))
+
+    return hatches, missing, needs
+
+
+def sell_items(auth, item_type, selling, owned):
+    """
+    Sell selling[key] of each item_type key we own owned[key] of. Sends
+    one request per key with the API's amount parameter; if the server
+    refuses that or only sells one, the rest go out as one-unit requests,
+    one after the other, as each rewrites the user's items.
+    """
+    seller = api.Habitica(auth=auth, resource="user", aspect="sell")
+    singles = []
+    for key, amount in selling.items():
+        if amount <= 0:
+            continue
+        try:
+            sold = seller(_method='post', _one=item_type, _two=key,
+                          _params={'amount': amount})
+        except api.requests.exceptions.HTTPError:
+            singles.extend([key] * amount)
+            continue
+        # the server answers with the user's stats and items after the sale
+        if not isinstance(sold, dict):
+            continue
+        left = sold.get('items', {}).get(item_type, {}).get(key)
+        if amount > 1 and left == owned.get(key, 0) - 1:
+            singles.extend([key] * (amount - 1))
+
+    results = run_concurrently(
+        [lambda key=key: seller(_method='post', _one=item_type, _two=key)
+         for key in singles], 1)
+    for key, (result, error) in zip(singles, results):
+        if error is not None:
+            print("Failed to sell %s: %s" % (nice_name(key), error))
+
+
+def fetch_tasks(hbt, store, task_type):
+    """Fetch the task_type list ('habits', 'dailys', 'todos') into store."""
+    tasks = hbt.tasks.user(type=task_type)
+    if task_type == 'todos':
+        tasks = [e for e in tasks if not e['completed']]
+    store.sync(hbt.headers['x-api-user'], task_type, tasks)
+    return tasks
+
+
+def sync_tasks(hbt, store, task_type):
+    """fetch_tasks() for a background thread; failing only gets logged."""
+    try:
+        fetch_tasks(hbt, store, task_type)
+    except Exception as e:
+        logging.info('Could not sync %s: %s' % (task_type, e))
+
+
+def load_tasks(hbt, store, task_type):
+    """
+    The task_type list to show: straight from the TaskStore if it was
+    synced in the last TASKS_FRESH seconds, or else fetched (the stored
+    list doing if the server is out of reach). The daemon shows what it
+    has right away and syncs on a background thread.
+    """
+    uid = hbt.headers['x-api-user']
+    tasks = store.tasks(uid, task_type)
+    if tasks is None:
+        return fetch_tasks(hbt, store, task_type)
+    if time() - store.synced(uid, task_type) < TASKS_FRESH:
+        return tasks
+    if serving:
+        Thread(target=sync_tasks, args=(hbt, store, task_type),
+               daemon=True).start()
+        return tasks
+    try:
+        return fetch_tasks(hbt, store, task_type)
+    except Exception as e:
+        if not is_offline(e):
+            raise
+        return tasks
+
+
+def sync_needs_cron(hbt, store):
+    """Fetch needsCron into store, for a background thread like sync_tasks."""
+    try:
+        user = hbt.user(userFields='needsCron')
+        store.set_needs_cron(hbt.headers['x-api-user'], user['needsCron'])
+    except Exception as e:
+        logging.info('Could not sync needsCron: %s' % e)
+
+
+def needs_cron(hbt, store, state, batch=None):
+    """
+    Whether the user has yet to start a new day, for the dailies: as seen
+    in the last TASKS_FRESH seconds, or else asked for (from state if the
+    whole user is needed anyway), like load_tasks(). Unknown (say,
+    offline) counts as False.
+    """
+    uid = hbt.headers['x-api-user']
+    stored = store.needs_cron(uid)
+    if batch is not None and batch.deferred:
+        # staying off the network
+        return bool(stored)
+    fresh = store.needs_cron(uid, TASKS_FRESH)
+    if fresh is not None:
+        return fresh
+    if stored is not None and batch is None and serving:
+        Thread(target=sync_needs_cron, args=(hbt, store), daemon=True).start()
+        return stored
+    try:
+        if batch is None:
+            value = bool(hbt.user(userFields='needsCron')['needsCron'])
+        else:
+            value = bool(state.user['needsCron'])
+    except Exception as e:
+        if not is_offline(e):
+            raise
+        return bool(stored)
+    store.set_needs_cron(uid, value)
+    return value
+
+
+def shown_tasks(hbt, store, task_type, batch=None):
+    """
+    The current task_type list for acting on <task-id>s, in the order it
+    was last shown, so the numbers mean what the user saw. Tasks added
+    since come last; if a shown task is gone, the list is shown afresh
+    and the command stops, rather than hit the wrong task.
+
+    For a deferred Batch, or one that can queue its changes while the
+    server is out of reach, the list in store is taken as current.
+    """
+    tasks = None
+    if batch is not None and batch.deferred:
+        tasks = store.tasks(hbt.headers['x-api-user'], task_type)
+    if tasks is None:
+        try:
+            tasks = fetch_tasks(hbt, store, task_type)
+        except Exception as e:
+            tasks = store.tasks(hbt.headers['x-api-user'], task_type)
+            if not (is_offline(e) and tasks is not None and batch is not None
+                    and batch.offline()):
+                raise
+    ids = store.shown(hbt.headers['x-api-user'], task_type)
+    if ids is None:
+        return tasks
+    index = by_id(tasks)
+    if any(tid not in index for tid in ids):
+        print('The %s changed since they were last listed, '
+              'please check the numbers:' % task_type)
+        show_tasks(hbt, store, task_type, tasks)
+        sys.exit(1)
+    shown = [index[tid] for tid in ids]
+    seen = set(task['id'] for task in shown)
+    return shown + [task for task in tasks if task['id'] not in seen]
+
+
+def show_tasks(hbt, store, task_type, tasks, **kwargs):
+    """Print a task list, noting its order for the next <task-id>s."""
+    store.show(hbt.headers['x-api-user'], task_type, tasks)
+    if task_type == 'habits':
+        for i, task in enumerate(tasks):
+            score = qualitative_task_score_from_value(task['value'])
+            print('[%s] %s %s' % (score, i + 1, task['text'])) #.encode('utf8')))
+    else:
+        print_task_list(tasks, **kwargs)
+
+
 def updated_task_list(tasks, tids):
     for tid in sorted(tids, reverse=True):
         del(tasks[int(tid)])
@@ -301,6 +821,11 @@ def cl_item_count(task):
 
 
 def print_task_list(tasks, needsCron = False):
+    import dateutil.parser
+    import dateutil.tz
+    import humanize
+    import pytz
+
     settings = load_settings(SETTINGS_CONF)
 
     # find longest task name to arrange additional info
@@ -357,7 +882,7 @@ def print_task_list(tasks, needsCron = False):
         print(task_line)
 
         # print checklist if desired and available
-        if checklists_on and checklist_available:
+        if getattr(display, 'checklists', False) and checklist_available:
             for c, check in enumerate(task['checklist']):
                 completed = 'x' if check['completed'] else '_'
                 print('%s%s [%s] %s' % ('\t'.rjust(rjust_todo),
@@ -386,6 +911,11 @@ def get_currency(gp, balance="0.0"):
         report += ', %d Silver' % (silver)
     return report
 
+# score response drop types: user.items section they land in
+DROP_TYPES = {'Food': 'food',
+              'Egg': 'eggs',
+              'HatchingPotion': 'hatchingPotions'}
+
 max_report = { 'exp': {'title':'Experience', 'max':'toNextLevel',
                                              'maxValue': "0"},
                'hp':  {'title':'Health', 'max':'maxHealth',
@@ -394,35 +924,168 @@ max_report = { 'exp': {'title':'Experience', 'max':'toNextLevel',
                                        'maxValue': "100"},
              }
 
+class UserDoc(dict):
+    """
+    A user document fetched with only some top-level fields. Reading a
+    field it lacks fetches the whole user (once) instead of failing.
+    """
+
+    def __init__(self, data, state):
+        dict.__init__(self, data)
+        self.state = state
+
+    def __missing__(self, key):
+        if self.state is None:
+            raise KeyError(key)
+        self.complete()
+        return self[key]
+
+    def get(self, key, default=None):
+        if key not in self:
+            self.complete()
+        return dict.get(self, key, default)
+
+    def complete(self):
+        if self.state is not None:
+            state, self.state = self.state, None
+            self.update(state.fetch())
+
+
+class WarmUsers(object):
+    """
+    Whole user documents the daemon keeps between commands, by user id.
+    One is handed out only while it is younger than ttl and no non-GET
+    request was sent since it was fetched, as that may have changed it.
+    """
+
+    def __init__(self, ttl=DAEMON_USER_TTL):
+        self.ttl = ttl
+        self.users = {}
+
+    def get(self, uid):
+        entry = self.users.get(uid)
+        if entry is None:
+            return None
+        fetched, writes, user = entry
+        if writes != api.writes or time() - fetched >= self.ttl:
+            del self.users[uid]
+            return None
+        return copy.deepcopy(user)
+
+    def put(self, uid, user):
+        self.users[uid] = (time(), api.writes, copy.deepcopy(dict(user)))
+
+
+class UserState(object):
+    """
+    The user document for one command invocation. It is fetched once, on
+    first use, with just the fields the command needs; score responses are
+    folded into it locally, and it is only fetched again by refresh() or
+    when a field asked for with get() is missing.
+    """
+
+    def __init__(self, hbt, fields=None, warm=None):
+        self.hbt = hbt
+        self.fields = fields
+        self.warm = warm
+        self._user = None
+        self.refetched = False
+
+    @property
+    def user(self):
+        if self._user is None and self.warm is not None:
+            self._user = self.warm.get(self.hbt.headers['x-api-user'])
+        if self._user is None:
+            self.refresh()
+        return self._user
+
+    def refresh(self):
+        """Fetch the user document again, e.g. after a server-side change."""
+        if self.fields:
+            self._user = UserDoc(self.hbt.user(userFields=','.join(
+                self.fields)), self)
+        else:
+            self._user = self.hbt.user()
+            if self.warm is not None:
+                self.warm.put(self.hbt.headers['x-api-user'], self._user)
+        return self._user
+
+    def fetch(self):
+        """Fetch the whole user, and stop projecting from now on."""
+        logging.debug('User fields %s were not enough, fetching all'
+                      % ','.join(self.fields or ()))
+        self.fields = None
+        return self.hbt.user()
+
+    def replace(self, user):
+        """Take a full user document the server handed back."""
+        self._user = user
+        if self.warm is not None:
+            self.warm.put(self.hbt.headers['x-api-user'], user)
+
+    def snapshot(self):
+        """A copy of the user as it is now, to diff against later."""
+        return copy.deepcopy(dict(self.user))
+
+    def _lookup(self, path):
+        value = self.user
+        for key in path.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        return value
+
+    def get(self, path, default=None):
+        """
+        Look up a dotted path like 'stats.maxMP'. If it's missing, the user
+        is refetched, but only the first time that happens per command.
+        """
+        value = self._lookup(path)
+        if value is None and not self.refetched:
+            self.refetched = True
+            self.refresh()
+            value = self._lookup(path)
+        return default if value is None else value
+
+    def apply_score(self, delta):
+        """Fold the stats returned by a tasks/:id/score call into the user."""
+        if not isinstance(delta, dict):
+            return
+        stats = self.user.setdefault('stats', {})
+        for key, value in delta.items():
+            if key in stats:
+                stats[key] = value
+        drop = delta.get('_tmp', {}).get('drop', {})
+        section = DROP_TYPES.get(drop.get('type'))
+        if section and drop.get('key'):
+            items = self.user.setdefault('items', {}).setdefault(section, {})
+            items[drop['key']] = items.get(drop['key'], 0) + 1
+
+
 # XXX: This is a hack to refresh the current stats to find maxes,
 # which are sometimes missing for some reason.
-def fix_max(hbt, item, bstats, astats, refresh=True):
+def fix_max(state, item, bstats, astats, refresh=True):
     if astats.get(max_report[item]['max'], None) == None:
         # If max exists in "before" stats, use it instead.
         if bstats.get(max_report[item]['max'], None) != None:
             astats[max_report[item]['max']] = bstats[max_report[item]['max']]
         elif refresh and item != 'hp':
-            # Perform full refresh and update all report items.
-            refresh = hbt.user()
-            rstats = refresh.get('stats', [])
+            # Refetch (at most once per command) and update all report items.
             for fixup in max_report:
-                astats[max_report[fixup]['max']] = rstats[max_report[fixup]['max']]
+                astats[max_report[fixup]['max']] = state.get(
+                    'stats.%s' % max_report[fixup]['max'],
+                    max_report[fixup]['maxValue'])
         else:
             # Either no refresh wanted, or max HP is missing which is static.
             astats[max_report[item]['max']] = max_report[item]['maxValue']
     return astats
 
-def show_delta(hbt, before, after):
-    bstats = before.get('stats', [])
-    astats = after.get('stats', [])
-    bitems = before.get('items', [])
-    aitems = after.get('items', [])
-
+def show_stats_delta(state, bstats, astats, bgems="0.0", agems="0.0"):
     for item in max_report:
         delta = int(astats[item] - bstats[item])
         if delta != 0:
             # XXX: hack to fix max entry.
-            astats = fix_max(hbt, item, bstats, astats)
+            astats = fix_max(state, item, bstats, astats)
 
             print('%s: %d (%d/%d)' % (max_report[item]['title'],
                                       delta, int(astats[item]),
@@ -433,12 +1096,76 @@ def show_delta(hbt, before, after):
     bgp = float(bstats.get('gp', "0.0"))
     agp = float(astats.get('gp', "0.0"))
     gp = agp - bgp
-    bgems = float(before.get('balance', "0.0"))
-    agems = float(after.get('balance', "0.0"))
-    gems = agems - bgems
+    gems = float(agems) - float(bgems)
     if gp != 0.0 or gems != 0.0:
         print("%s" % (get_currency(gp, gems)))
 
+def payload_stats(result):
+    """The user's stats as returned by a task score or a cast call."""
+    if isinstance(result, dict) and isinstance(result.get('user'), dict):
+        # casting answers with (some of) the user document
+        result = result['user'].get('stats')
+    if isinstance(result, dict) and 'hp' in result:
+        return result
+    return None
+
+def show_payload_delta(state, before, results):
+    """
+    Report what score or cast calls changed using the stats and drops
+    in the server's responses, in order, without fetching or walking
+    the user's items. Returns False if the responses don't carry stats,
+    in which case the caller should fall back to show_delta().
+    """
+    bstats = before.get('stats', {})
+    astats = dict(bstats)
+    found = False
+    for result in results:
+        stats = payload_stats(result)
+        if stats is None:
+            continue
+        found = True
+        astats.update((key, value) for key, value in stats.items()
+                      if not isinstance(value, dict))
+    if not found:
+        return False
+
+    show_stats_delta(state, bstats, astats)
+
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        drop = result.get('_tmp', {}).get('drop', {})
+        if drop.get('key'):
+            print("Received %s" % (nice_name(drop['key'])))
+    return True
+
+def show_batch_delta(state, before, batch, results):
+    """
+    Report what a submitted Batch changed, however it was sent. With
+    before None, everything was queued and nothing changed yet.
+    """
+    if before is None:
+        return
+    if batch.user is not None:
+        state.replace(batch.user)
+    elif batch.stale:
+        state.refresh()
+    elif show_payload_delta(state, before,
+                            [result for result, error in results]) \
+            or batch.queued:
+        # without the server, what was sent is all there is to report
+        return
+    show_delta(state, before, state.user)
+
+def show_delta(state, before, after):
+    bstats = before.get('stats', [])
+    astats = after.get('stats', [])
+    bitems = before.get('items', [])
+    aitems = after.get('items', [])
+
+    show_stats_delta(state, bstats, astats, before.get('balance', "0.0"),
+                     after.get('balance', "0.0"))
+
     # Pets
     apets = aitems['pets']
     bpets = bitems['pets']
@@ -550,20 +1277,485 @@ def do_item_enumerate(user, requested, ordered=False, pretty=True):
             for item in results:
                 print('%s' % (item))
 
-def get_members(auth, party):
+def project(doc, fields):
+    """Copy only the dotted fields (e.g. 'stats.hp') out of doc."""
+    result = {}
+    for field in fields:
+        src, dst = doc, result
+        keys = field.split('.')
+        for key in keys[:-1]:
+            src = src.get(key, {})
+            dst = dst.setdefault(key, {})
+        if keys[-1] in src:
+            dst[keys[-1]] = src[keys[-1]]
+    return result
+
+
+def fetch_members(auth, ids, workers=HABITICA_REQUEST_WORKERS, cache=None):
+    """
+    Fetch the profiles of member ids concurrently, keeping only
+    MEMBER_FIELDS of each and storing them in cache if given. Returns
+    them in the order of ids, with None for members that failed.
+    """
+    results = run_concurrently(
+        [lambda mid=mid: api.Habitica(auth=auth, resource="members",
+                                      aspect=mid)()
+         for mid in ids], workers)
+    members = []
+    for mid, (member, error) in zip(ids, results):
+        if error is not None or not member:
+            logging.warning("Couldn't fetch member %s: %s" % (mid, error))
+            members.append(None)
+            continue
+        member = project(member, MEMBER_FIELDS)
+        members.append(member)
+        if cache is not None:
+            cache.set(SECTION_CACHE_MEMBERS, mid,
+                      json.dumps({'fetched': time(), 'member': member}),
+                      ttl=MEMBERS_STALE)
+    if cache is not None:
+        cache.commit()
+    return members
+
+
+class Batch(object):
+    """
+    Task mutations collected by a command and sent to the server in one
+    user/batch-update call. If the server doesn't have that endpoint,
+    every op is sent as its own request instead, one after the other.
+
+    With an Outbox, ops the server can't be reached for are queued there
+    instead of lost. A deferred Batch (the 'outbox' setting, or older ops
+    still waiting to go out first) queues all of them and leaves sending
+    to a background flush_outbox().
+    """
+
+    def __init__(self, auth, workers=HABITICA_REQUEST_WORKERS, outbox=None,
+                 defer=False):
+        self.auth = auth
+        self.workers = workers
+        self.ops = []
+        self.user = None
+        self.stale = False
+        self.outbox = outbox
+        self.deferred = outbox is not None and bool(
+            defer or outbox.count(auth['x-api-user']))
+        self.queued = 0
+        self.unreachable = False
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _add(self, op, expect):
+        """Add op, with what it leaves behind for applied() to check."""
+        self.ops.append((op, expect))
+
+    def score(self, task, direction):
+        expect = {'id': task['id']}
+        if task.get('type') != 'habit':
+            expect['completed'] = direction == 'up'
+        self._add({'op': 'score',
+                   'params': {'id': task['id'], 'direction': direction}},
+                  expect)
+
+    def score_checklist(self, task, item):
+        check = task['checklist'][item]
+        self._add({'op': 'scoreChecklistItem',
+                   'params': {'taskId': task['id'], 'itemId': check['id']}},
+                  {'id': task['id'], 'item': check['id'],
+                   'completed': not check['completed']})
+
+    def add(self, **task):
+        """
+        Add a task. Returns its body, which gets the alias the task can
+        be found (and scored or deleted) by if the op is queued.
+        """
+        self._add({'op': 'addTask', 'body': task}, {})
+        return task
+
+    def delete(self, task):
+        self._add({'op': 'deleteTask', 'params': {'id': task['id']}},
+                  {'id': task['id']})
+
+    def offline(self):
+        """
+        Note the server can't be reached, so the rest of the command
+        works from local data and queues its changes. False if there's no
+        outbox to queue them in.
+        """
+        if self.outbox is None:
+            return False
+        self.deferred = self.unreachable = True
+        return True
+
+    def queue(self, ops):
+        """Put (op, expect) pairs in the outbox, to be sent later in order."""
+        for op, expect in ops:
+            if op['op'] == 'addTask':
+                # lets a replay find out whether the task was created already
+                op['body'].setdefault('alias', 'q' + uuid.uuid4().hex)
+                expect['alias'] = op['body']['alias']
+        self.outbox.put(self.auth['x-api-user'], ops)
+        self.queued += len(ops)
+        print('Queued %d change%s for the server'
+              % (len(ops), '' if len(ops) == 1 else 's'))
+
+    def submit(self):
+        """
+        Send the collected ops, returning a (result, exception) pair per
+        op in the order they were added. A successful batch answers with
+        the updated user document, kept in self.user (or else self.stale
+        is set); the per-op results are then None, as the server doesn't
+        report them one by one. So are those of queued ops.
+        """
+        ops, self.ops = self.ops, []
+        if self.deferred:
+            self.queue(ops)
+            if not self.unreachable:
+                flush_later(self.auth, self.outbox, self.workers)
+            return [(None, None)] * len(ops)
+        if len(ops) > 1:
+            batch = api.Habitica(auth=self.auth, resource='user',
+                                 aspect='batch-update')
+            try:
+                user = batch(_method='post', ops=[op for op, expect in ops])
+            except Exception as e:
+                if is_offline(e) and self.offline():
+                    self.queue(ops)
+                    return [(None, None)] * len(ops)
+                if not isinstance(e, api.requests.exceptions.HTTPError):
+                    raise
+                if e.response is None or e.response.status_code != 404:
+                    # the batch may have been partly applied, don't redo it
+                    return [(None, e)] * len(ops)
+                logging.debug('user/batch-update unavailable, sending %d '
+                              'ops separately' % len(ops))
+            else:
+                # any success means the ops were applied; if the answer
+                # isn't a usable user document, it has to be refetched
+                if isinstance(user, dict) and 'stats' in user:
+                    self.user = user
+                else:
+                    self.stale = True
+                return [(None, None)] * len(ops)
+        # one at a time: concurrent requests could overwrite each
+        # other's changes to the user
+        results = run_concurrently([op_call(self.auth, op)
+                                    for op, expect in ops], 1)
+        failed = [i for i, (result, error) in enumerate(results)
+                  if is_offline(error)]
+        if failed and self.offline():
+            self.queue([ops[i] for i in failed])
+            for i in failed:
+                results[i] = (None, None)
+        return results
+
+
+def by_id(tasks):
+    """
+    Index tasks by id, and also by alias, which stands in for the id of
+    a task added while its addTask op was queued.
+    """
+    index = dict((task['id'], task) for task in tasks)
+    for task in tasks:
+        if task.get('alias'):
+            index.setdefault(task['alias'], task)
+    return index
+
+
+def applied(op, expect, tasks):
+    """
+    Whether queued op already shows in tasks, the user's tasks by id (and
+    alias), so sending it again would do it twice. Habit scores can't be
+    told apart and are always sent.
+    """
+    if op['op'] == 'addTask':
+        return any(task.get('alias') == expect['alias']
+                   for task in tasks.values())
+    task = tasks.get(expect['id'])
+    if task is None:
+        # deleted, or a completed todo, which aren't listed
+        return True
+    if 'item' in expect:
+        for check in task.get('checklist', []):
+            if check['id'] == expect['item']:
+                return check.get('completed') == expect['completed']
+        return True
+    if 'completed' in expect:
+        return task.get('completed') == expect['completed']
+    return False
+
+
+def assume_applied(op, expect, tasks):
+    """Update tasks as if queued op had been sent, for the ops after it."""
+    task = tasks.get(expect.get('id'))
+    if op['op'] == 'addTask':
+        # later ops on the new task go by its alias
+        tasks[expect['alias']] = dict(op['body'], completed=False)
+    elif op['op'] == 'deleteTask':
+        tasks.pop(expect['id'], None)
+    elif 'item' in expect:
+        for check in task.get('checklist', []):
+            if check['id'] == expect['item']:
+                check['completed'] = expect['completed']
+    elif 'completed' in expect:
+        task['completed'] = expect['completed']
+
+
+def rejected(error):
+    """Whether error is the server refusing a request for good."""
+    return isinstance(error, api.requests.exceptions.HTTPError) and \
+        error.response is not None and \
+        400 <= error.response.status_code < 500 and \
+        error.response.status_code not in (401, api.HTTP_TOO_MANY_REQUESTS)
+
+
+def flush_outbox(auth, outbox, workers=HABITICA_REQUEST_WORKERS):
+    """
+    Send the changes queued in outbox for auth's user, in order and in
+    bulk, skipping those the server has already, e.g. from a flush cut
+    short. If the server refuses the bulk request, the ops are sent one
+    at a time instead, and only those it rejects are dropped, with a
+    warning. Any other failure stops the flush, keeping the rest queued.
+    Only one process flushes a user's outbox at a time.
+    """
+    user = auth['x-api-user']
+    if not outbox.claim(user):
+        return
+    try:
+        single = False
+        pending = outbox.pending(user)
+        while pending:
+            tasks = by_id(api.Habitica(auth=auth).tasks.user())
+            done, sent = [], []
+            for seq, op, expect in pending:
+                if applied(op, expect, tasks):
+                    done.append(seq)
+                    continue
+                assume_applied(op, expect, tasks)
+                sent.append((seq, op))
+            outbox.done(done)
+            if done:
+                logging.info('%d queued change(s) were applied already'
+                             % len(done))
+            if len(sent) > 1 and not single:
+                batch = api.Habitica(auth=auth, resource='user',
+                                     aspect='batch-update')
+                try:
+                    batch(_method='post', ops=[op for seq, op in sent])
+                except api.requests.exceptions.HTTPError as e:
+                    if is_offline(e):
+                        raise
+                    # find out which op the server won't take, after
+                    # checking again what the batch may have applied
+                    logging.info('Queued changes refused in bulk (%s), '
+                                 'sending them one by one' % e)
+                    single = True
+                    continue
+                results = [(None, None)] * len(sent)
+            else:
+                # one at a time, to keep the order
+                results = run_concurrently([op_call(auth, op)
+                                            for seq, op in sent], 1)
+            for (seq, op), (result, error) in zip(sent, results):
+                if error is not None and not rejected(error):
+                    logging.info('Could not send queued %s: %s'
+                                 % (op['op'], error))
+                    return
+                if error is not None:
+                    logging.warning('Dropping queued %s: %s'
+                                    % (op['op'], error))
+                outbox.done([seq])
+            pending = outbox.pending(user)
+    except Exception as e:
+        logging.info('Could not send queued changes: %s' % e)
+    finally:
+        outbox.release(user)
+
+
+def flush_account(user):
+    """
+    flush_outbox() for the account with user id user, as the whole job
+    of a process started by flush_later().
+    """
+    settings = load_settings(SETTINGS_CONF)
+    api.configure(pool_size=settings['pool-size'],
+                  keep_alive=bool(settings['keep-alive']),
+                  timeout=(settings['connect-timeout'],
+                           settings['read-timeout']))
+    for auth in load_accounts(AUTH_CONF).values():
+        if auth['x-api-user'] == user:
+            flush_outbox(auth, Outbox(load_cache(CACHE_DB)),
+                         settings['workers'])
+            return
+
+
+def flush_later(auth, outbox, workers=HABITICA_REQUEST_WORKERS):
+    """
+    Have auth's queued changes sent without waiting for it: by a thread
+    in the daemon, otherwise by a detached process, so the command that
+    queued them can exit right away.
+    """
+    if serving:
+        Thread(target=flush_outbox, args=(auth, outbox, workers)).start()
+        return
+    import subprocess
+    env = dict(os.environ)
+    # the package may not be installed, e.g. when run from bin/habitica
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [package] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    code = 'from habitica.core import flush_account; flush_account(%r)'
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, '-c', code % auth['x-api-user']],
+                         env=env, stdin=devnull, stdout=devnull,
+                         stderr=devnull, start_new_session=True)
+
+
+def read_todos(lines, priority, skip=0):
+    """
+    Turn lines of plain text, or of JSON task objects, into new todos.
+    Yields (line number, task) pairs, skipping the first skip lines and
+    any blank ones.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if number <= skip or not line:
+            continue
+        if line.startswith('{'):
+            task = json.loads(line)
+        else:
+            task = {'text': line}
+        task['type'] = 'todo'
+        task.setdefault('priority', priority)
+        yield number, task
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_todos(auth, cache, source, lines, priority,
+                 size=IMPORT_BATCH_SIZE):
+    """
+    Create a todo per line, size at a time with one array-bodied POST
+    each. After every batch the line reached is checkpointed in the
+    cache, so a rerun after a failure resumes there instead of creating
+    the same todos twice.
+
+    The checkpoint is keyed by the user and a hash of the first
+    IMPORT_KEY_LINES lines, and holds a running hash of the lines up to
+    the one reached, so only the very same input (from a file or stdin)
+    resumes; nothing is read ahead beyond those first lines. source only
+    names the input. Returns how many were created.
+    """
+    import hashlib
+    from itertools import chain, islice
+    head = list(islice(lines, IMPORT_KEY_LINES))
+    key = '%s/%s' % (auth['x-api-user'], hashlib.sha256(
+        ''.join(head).encode('utf-8')).hexdigest())
+    done, _, expected = cache.get(SECTION_CACHE_IMPORT, key,
+                                  '0').partition(' ')
+    done = int(done)
+    if done:
+        print('Resuming import of %s after line %d' % (source, done))
+    digest = hashlib.sha256()
+
+    def hashed(lines):
+        # keep the running hash, and check the lines skipped match
+        for number, line in enumerate(lines, 1):
+            digest.update(line.encode('utf-8'))
+            if number == done and expected and \
+                    digest.hexdigest() != expected:
+                cache.delete(SECTION_CACHE_IMPORT, key)
+                cache.commit()
+                print('%s differs from the import that was interrupted '
+                      'after line %d; run it again to import it from the '
+                      'start' % (source, done))
+                sys.exit(1)
+            yield line
+
+    creator = api.Habitica(auth=auth, resource='tasks', aspect='user')
+    created = 0
+    for chunk in chunked(read_todos(hashed(chain(head, lines)), priority,
+                                    done), size):
+        creator(_method='post', _data=[task for number, task in chunk])
+        for number, task in chunk:
+            print('added new todo \'%s\'' % task['text'])
+        created += len(chunk)
+        # chunked() hands a full chunk on before reading further, so the
+        # hash covers just the lines up to the chunk's last
+        with cache:
+            cache.set(SECTION_CACHE_IMPORT, key, '%d %s' % (
+                chunk[-1][0], digest.hexdigest()), ttl=IMPORT_TTL)
+    cache.delete(SECTION_CACHE_IMPORT, key)
+    cache.commit()
+    return created
+
+
+def load_members(auth, ids, workers=HABITICA_REQUEST_WORKERS, cache=None):
+    """
+    Return the profiles of the given member ids, in the order of ids,
+    with None for any member that couldn't be fetched, so one bad
+    profile doesn't sink the whole report.
+
+    With a cache, profiles fetched less than MEMBERS_TTL ago are used as
+    is, and the rest are fetched. The daemon, which outlives the command,
+    shows older profiles while a background thread refreshes them, and
+    only fetches members it knows nothing about right away.
+    """
+    if cache is None:
+        return fetch_members(auth, ids, workers)
+
+    members = []
+    missing = []
+    stale = []
+    for mid in ids:
+        entry = cache.get(SECTION_CACHE_MEMBERS, mid)
+        if entry is None:
+            missing.append(mid)
+            members.append(None)
+            continue
+        entry = json.loads(entry)
+        if time() - entry['fetched'] > MEMBERS_TTL:
+            stale.append(mid)
+            if not serving:
+                missing.append(mid)
+        members.append(entry['member'])
+
+    if missing:
+        fetched = dict(zip(missing, fetch_members(auth, missing, workers,
+                                                  cache)))
+        # a stale profile beats none if refreshing it failed
+        members = [fetched.get(mid) or member
+                   for mid, member in zip(ids, members)]
+    if stale and serving:
+        logging.debug('Refreshing %d cached members' % len(stale))
+        Thread(target=fetch_members, args=(auth, stale, workers, cache),
+               daemon=True).start()
+    return members
+
+def get_members(auth, party, workers=HABITICA_REQUEST_WORKERS, cache=None):
     result = []
     if not party:
         return result
     group = api.Habitica(auth=auth, resource="groups", aspect=party['id'])
     members = group(_one='members')
-    for i in members:
-        member = api.Habitica(auth=auth, resource="members", aspect=i['id'])()
-        result.append(member)
-    return result
+    return [member for member in
+            load_members(auth, [i['id'] for i in members], workers, cache)
+            if member is not None]
 
 def stat_down(hbt, user, stat, amount):
     stats = user.get('stats', [])
-    stats = fix_max(hbt, stat, stats, stats, refresh=False)
+    stats = fix_max(None, stat, stats, stats, refresh=False)
     down = int(stats.get(max_report[stat]['max'],"0")) - int(stats[stat])
     print("%s has %d/%d %s" % (user['profile']['name'], int(stats[stat]),
                                int(stats[max_report[stat]['max']]),
@@ -576,7 +1768,7 @@ def party_hp_down_ten(auth, hbt, user, party=None, myself=False):
     needs_healing = False
     down = False
     if party == None:
-        party = hbt.groups.party()
+        party = get_party(hbt)
     if not myself:
         members = get_members(auth, party)
     else:
@@ -593,21 +1785,19 @@ def party_hp_down_ten(auth, hbt, user, party=None, myself=False):
 
 def hp_down_ten(auth, hbt, user):
     # Do a party check, but just a party of myself.
-    party_hp_down_ten(hbt, user, myself=True)
+    party_hp_down_ten(auth, hbt, user, myself=True)
 
 
 def set_checklists_status(auth, args):
     """Set display_checklist status, toggling from cli flag"""
-    global checklists_on
-
     if auth['checklists'] == "true":
-        checklists_on = True
+        display.checklists = True
     else:
-        checklists_on = False
+        display.checklists = False
 
     # reverse the config setting if specified by the CLI option
 #    if args['--checklists']:
-#        checklists_on = not checklists_on
+#        display.checklists = not display.checklists
 
     return
 
@@ -627,13 +1817,18 @@ def isChecklistItem(tid):
         logging.debug('None')
         return None
 
-def group_user_status(quest_data, auth, hbt):
+def group_user_status(quest_data, auth, hbt,
+                      workers=HABITICA_REQUEST_WORKERS, cache=None):
     groupUserStatus = {}
     groupUserStatus['users'] = {}
     groupUserStatus['queststatus'] = quest_data['active']
-    for user in quest_data['members'].keys():
+    groupUserStatus['longestname'] = 1
+    users = list(quest_data['members'].keys())
+    for user, member in zip(users, load_members(auth, users, workers,
+                                                cache)):
+        if member is None:
+            continue
         groupUserStatus['users'][user] = {}
-        member = getattr(hbt.members, user)()
         groupUserStatus.setdefault('longestname', 1)
         if len(member['profile']['name']) > groupUserStatus['longestname']:
                 groupUserStatus['longestname'] = len(member['profile']['name'])
@@ -658,6 +1853,10 @@ def group_user_status(quest_data, auth, hbt):
 
 
 def print_gus(groupUserStatus, len_ljust):
+    import dateutil.parser
+    import humanize
+    import pytz
+
     len_ljust += 1
     headLine = ' '.rjust(len_ljust, ' ')
     headLine += 'Name'.ljust(groupUserStatus['longestname'] + 1)
@@ -684,37 +1883,42 @@ def print_gus(groupUserStatus, len_ljust):
         userLine += (str(int(user['mp'])) + '/' + str(user['maxMP'])).ljust(8, ' ')
         print(userLine)
 
-def get_quest_info(hbt, quest_key):
-# we're on a new quest, update quest key
+def get_quest_info(hbt, quest_key, cache):
+    """
+    The type ('collect' or 'hp'), maximum and title of quest quest_key,
+    as strings, from the cache or else /content.
+    """
+    info = [cache.get(SECTION_CACHE_QUEST, '%s/%s' % (quest_key, name))
+            for name in ('type', 'max', 'title')]
+    if None not in info:
+        return info
     logging.info('Updating quest information...')
-    content = hbt.content()
-    quest_type = ''
+    # only the quests are decompressed out of the cached /content
+    quest = load_content(hbt).quests[quest_key]
+    qt = ''
     quest_max = '-1'
-    quest_title = content['quests'][quest_key]['text']
+    quest_title = quest['text']
 
     # if there's a content/quests/<quest_key/collect,
     # then drill into .../collect/<whatever>/count and
     # .../collect/<whatever>/text and get those values
-    if content.get('quests', {}).get(quest_key,
-                             {}).get('collect'):
+    if quest.get('collect'):
        logging.debug("\tOn a collection type of quest")
        qt = 'collect'
-       clct = list(content['quests'][quest_key][qt].values())[0]
+       clct = list(quest[qt].values())[0]
        quest_max = clct['count']
        # else if it's a boss, then hit up
        # content/quests/<quest_key>/boss/hp
-    elif content.get('quests', {}).get(quest_key,
-                                 {}).get('boss'):
+    elif quest.get('boss'):
         logging.debug("\tOn a boss/hp type of quest")
         qt = 'hp'
-        quest_max = content['quests'][quest_key]['boss'][qt]
+        quest_max = quest['boss'][qt]
 
         # store repr of quest info from /content
-    cache = update_quest_cache(CACHE_CONF,
-                               quest_key=str(quest_key),
-                               quest_type=str(qt),
-                               quest_max=str(quest_max),
-                               quest_title=str(quest_title))
+    info = [str(qt), str(quest_max), str(quest_title)]
+    update_quest_cache(cache, quest_key, type=info[0], max=info[1],
+                       title=info[2])
+    return info
 
 def chatID(party, user, guilds):
     message = ('Invalid ID - must be 0 for party or > 0.\n'
@@ -746,6 +1950,8 @@ def chatID(party, user, guilds):
         sys.exit(1)
 
 def printChatMessages(messages, messageNum, width):
+    import humanize
+
     messages = sorted(messages, key=lambda k: k['timestamp'])
     messages = messages[-messageNum:]
     for message in messages:
@@ -757,19 +1963,160 @@ def printChatMessages(messages, messageNum, width):
                                 textwrap.fill(message['text'], width=width)))
 
 
+class AccountOutput(object):
+    """
+    Stand-in for sys.stdout while a command runs for several accounts at
+    once: each worker thread writes into a buffer of its own, which is
+    printed later as that account's part of the report.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = local()
+
+    def capture(self):
+        self.local.buffer = io.StringIO()
+
+    def release(self):
+        buffer = self.local.buffer
+        del self.local.buffer
+        return buffer.getvalue()
+
+    def write(self, text):
+        return getattr(self.local, 'buffer', self.stream).write(text)
+
+    def flush(self):
+        getattr(self.local, 'buffer', self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Profile(object):
+    """
+    The API requests a command line makes, recorded through api.hooks
+    while it runs. With show, a summary is printed at the end; with a
+    log file, every request is appended to it as a line of JSON.
+    """
+
+    def __init__(self, command, show=False, log=None):
+        self.command = command
+        self.show = show
+        self.log = log
+        self.lock = Lock()
+        self.records = []
+        self.started = None
+
+    def __call__(self, entry):
+        with self.lock:
+            self.records.append(entry)
+
+    def __enter__(self):
+        if self.show or self.log:
+            self.started = time()
+            api.hooks.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.started is None:
+            return
+        api.hooks.remove(self)
+        wall = time() - self.started
+        if self.log:
+            with open(self.log, 'a') as log:
+                for entry in self.records:
+                    entry = dict(entry, command=self.command)
+                    log.write(json.dumps(entry, sort_keys=True) + '\n')
+        if self.show:
+            self.report(wall)
+
+    def report(self, wall):
+        """Print request count, times and the slowest endpoints."""
+        records = self.records
+        print('-' * 53)
+        print('%s: %d request%s, %.3fs in all'
+              % (self.command, len(records), '' if len(records) == 1
+                 else 's', wall))
+        if not records:
+            return
+        print('%.3fs in requests, %.1f ms decoding, %d retries, %.1f kB'
+              % (sum(e['latency'] for e in records),
+                 sum(e['decode'] for e in records) * 1000,
+                 sum(e['retries'] for e in records),
+                 sum(e['bytes'] or 0 for e in records) / 1000.0))
+        endpoints = {}
+        for e in records:
+            key = '%s %s' % (e['method'], e['endpoint'])
+            calls, total, slowest = endpoints.get(key, (0, 0.0, 0.0))
+            endpoints[key] = (calls + 1, total + e['latency'],
+                              max(slowest, e['latency']))
+        print('calls    total  slowest  endpoint')
+        for key, (calls, total, slowest) in sorted(
+                endpoints.items(), key=lambda item: -item[1][1])[:PROFILE_TOP]:
+            print('%5d %7.3fs %7.3fs  %s' % (calls, total, slowest, key))
+
+
+def run_accounts(args, accounts, settings, cache, warm=None):
+    """
+    Run the command in args for each of accounts (name -> auth) at once,
+    then print every account's output in turn. Returns the failed names.
+    """
+    output = AccountOutput(sys.stdout)
+
+    def run(name):
+        output.capture()
+        status = 0
+        try:
+            run_command(args, accounts[name], settings, cache, warm)
+        except SystemExit as e:
+            status = e.code or 0
+        except Exception as e:
+            print('%s: %s' % (type(e).__name__, e))
+            status = 1
+        return status, output.release()
+
+    sys.stdout = output
+    try:
+        results = run_concurrently([lambda name=name: run(name)
+                                    for name in accounts],
+                                   settings['workers'])
+    finally:
+        sys.stdout = output.stream
+
+    failed = []
+    for name, (result, error) in zip(accounts, results):
+        status, text = result
+        print('### %s: %s' % (name, 'failed' if status else 'ok'))
+        if text:
+            print(text.rstrip('\n'))
+        if status:
+            failed.append(name)
+    print('')
+    print('%d accounts, %d failed%s' % (len(accounts), len(failed),
+                                        ': ' + ', '.join(failed)
+                                        if failed else ''))
+    return failed
+
+
 def cli():
     """Habitica command-line interface.
 
   Usage: habitica [--version] [--help]
                   <command> [<args>...] [--difficulty=<d>]
                   [--verbose | --debug]
+                  [--accounts=<names> | --all-accounts]
+                  [--profile] [--profile-log=<file>]
 
   Options:
-    -h --help         Show this screen
-    --version         Show version
-    --difficulty=<d>  (easy | medium | hard) [default: easy]
-    --verbose         Show some logging information
-    --debug           Some all logging information
+    -h --help           Show this screen
+    --version           Show version
+    --difficulty=<d>    (easy | medium | hard) [default: easy]
+    --verbose           Show some logging information
+    --debug             Some all logging information
+    --accounts=<names>  Run the command for these comma-separated accounts
+    --all-accounts      Run the command for every account in auth.cfg
+    --profile           Report the API requests the command made
+    --profile-log=<file>  Append a JSON line per API request to <file>
 
   The habitica commands are:
     status                     Show HP, XP, GP, and more
@@ -783,6 +2130,8 @@ def cli():
     todos                      List todo tasks
     todos done <task-id>       Mark one or more todo <task-id> completed
     todos add <task>           Add todo with description <task>
+    todos import [<file>]      Add a todo per line of <file> (or stdin);
+                               lines may also be JSON task objects
     todos delete <task-id>     Delete one or more todo <task-id>
     server                     Show status of Habitica service
     home                       Open tasks page in default browser
@@ -814,10 +2163,17 @@ def cli():
     chat show [<id>] [<num>]   Shows last <num> messages from chat <id>
                                (defaults: ID 0, num 5)
     chat send <id> "<Message>" Sends Message to chat ID
+    daemon                     Keep connections and data warm, and serve
+                               commands over a socket for a quicker start
 
   For `habits up|down`, `dailies done|undo`, and `todos done`, you can pass
   one or more <task-id> parameters, using either comma-separated lists or
   ranges or both. For example, `todos done 1,3,6-9,11`.
+
+  Accounts besides the [Habitica] one (called `default`) are configured
+  in [Habitica:<name>] sections of auth.cfg. The account options run a
+  command for each of those accounts at once, then print the output
+  account by account.
   """
 
     # set up args
@@ -832,25 +2188,135 @@ def cli():
     logging.debug('Command line args: {%s}' %
                   ', '.join("'%s': '%s'" % (k, v) for k, v in args.items()))
 
-    # list of kinds of pets/potions (disregarding Magic Potion ones)
-    kinds = [ 'Base', 'CottonCandyBlue', 'CottonCandyPink', 'Golden',
-              'White', 'Red', 'Shade', 'Skeleton', 'Desert', 'Zombie' ]
+    # Load settings
+    settings = load_settings(SETTINGS_CONF)
 
-    # Set up auth
-    auth = load_auth(AUTH_CONF)
+    # instantiate api service, sharing one pooled keep-alive session
+    api.configure(pool_size=settings['pool-size'],
+                  keep_alive=bool(settings['keep-alive']),
+                  timeout=(settings['connect-timeout'],
+                           settings['read-timeout']))
 
     # Prepare cache
-    cache = load_cache(CACHE_CONF)
+    cache = load_cache(CACHE_DB)
 
-    # Load settings
-    settings = load_settings(SETTINGS_CONF)
+    if args['<command>'] == 'daemon':
+        serve(DAEMON_SOCKET, cache)
+    else:
+        run_args(args, settings, cache)
 
-    # instantiate api service
+
+def run_args(args, settings, cache, warm=None):
+    """Run a parsed command line for the account(s) it asks for."""
+    command = ' '.join([args['<command>']] + args['<args>'][:1])
+    with Profile(command, args['--profile'],
+                 args['--profile-log'] or settings['profile-log']):
+        run_parsed(args, settings, cache, warm)
+
+
+def run_parsed(args, settings, cache, warm=None):
+    """run_args() without the profiling."""
+    # Set up auth
+    if args['--accounts'] or args['--all-accounts']:
+        accounts = load_accounts(AUTH_CONF)
+        if args['--accounts']:
+            names = [n.strip() for n in args['--accounts'].split(',')]
+            unknown = [n for n in names if n not in accounts]
+            if unknown:
+                logging.error("Unknown account(s) in '%s': %s"
+                              % (AUTH_CONF, ', '.join(unknown)))
+                sys.exit(1)
+            accounts = OrderedDict((n, accounts[n]) for n in names)
+        auth = None
+    else:
+        auth = load_auth(AUTH_CONF)
+
+    if auth is None:
+        if run_accounts(args, accounts, settings, cache, warm):
+            sys.exit(1)
+    else:
+        run_command(args, auth, settings, cache, warm)
+
+
+def serve(path, cache):
+    """
+    Keep the API session, user documents and content warm, and run the
+    command lines bin/habitica sends over the Unix socket at path, one
+    at a time. A request is a JSON line {"argv": [...]}; the answer is
+    {"status": <exit status>, "output": <what the command printed>}.
+    """
+    import signal
+    import socket
+    import socketserver
+
+    global serving
+    serving = True
+    warm = WarmUsers()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            argv = json.loads(self.rfile.readline().decode('utf-8'))['argv']
+            logging.info('Running %s' % ' '.join(argv))
+            output = io.StringIO()
+            status = 0
+            with redirect_stdout(output):
+                try:
+                    args = docopt(cli.__doc__, argv=argv, version=VERSION)
+                    # settings.cfg is cheap to re-read; pool options
+                    # only change when the daemon is restarted
+                    run_args(args, load_settings(SETTINGS_CONF), cache, warm)
+                except SystemExit as e:
+                    status = e.code or 0
+                except Exception as e:
+                    logging.exception('Command %s failed' % ' '.join(argv))
+                    print('%s: %s' % (type(e).__name__, e))
+                    status = 1
+            reply = {'status': status, 'output': output.getvalue()}
+            self.wfile.write(json.dumps(reply).encode('utf-8'))
+
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(path)
+        except socket.error:
+            os.unlink(path)  # left behind by a daemon that died
+        else:
+            print('A habitica daemon is already running on %s' % path)
+            sys.exit(1)
+        finally:
+            probe.close()
+
+    server = socketserver.UnixStreamServer(path, Handler)
+    os.chmod(path, 0o600)
+    # clean up the socket on kill as well as on ^C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print('Serving habitica commands on %s' % path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+def run_command(args, auth, settings, cache, warm=None):
+    """Run the command parsed into args as the user auth belongs to."""
     hbt = api.Habitica(auth=auth)
+    if warm is not None:
+        # the daemon keeps whole user documents around for later commands
+        state = UserState(hbt, warm=warm)
+    else:
+        state = UserState(hbt, USER_FIELDS.get(args['<command>']))
 
     # Flag checklists as on if true in the config
     set_checklists_status(auth, args)
 
+    # send what earlier commands queued, while this one runs
+    outbox = Outbox(cache)
+    if outbox.count(auth['x-api-user']):
+        flush_later(auth, outbox, settings['workers'])
+
     # GET server status (v3 ok)
     if args['<command>'] == 'server':
         server = hbt.status()
@@ -863,225 +2329,91 @@ def cli():
     elif args['<command>'] == 'home':
         home_url = '%s%s' % (auth['url'], HABITICA_TASKS_PAGE)
         print('Opening %s' % home_url)
+        from webbrowser import open_new_tab
         open_new_tab(home_url)
 
     # GET item lists (v3 ok)
     elif args['<command>'] == 'item':
-        user = hbt.user()
+        user = state.user
         do_item_enumerate(user, args['<args>'])
 
     # Feed all possible animals (v3 ok)
     elif args['<command>'] == 'feed':
-        feeding = {
-                    'Saddle':           'ignore',
-                    'Meat':             'Base',
-                    'CottonCandyBlue':  'CottonCandyBlue',
-                    'CottonCandyPink':  'CottonCandyPink',
-                    'Honey':            'Golden',
-                    'Milk':             'White',
-                    'Strawberry':       'Red',
-                    'Chocolate':        'Shade',
-                    'Fish':             'Skeleton',
-                    'Potatoe':          'Desert',
-                    'RottenMeat':       'Zombie',
-                  }
-
-        user = hbt.user()
-        refreshed = True
-
-        attempted_foods = set()
-        fed_foods = set()
-
-        while refreshed:
-            refreshed = False
-            items = user.get('items', [])
-            foods = items['food']
-            pets = items['pets']
-            mounts = items['mounts']
-
-            magic_pets = []
-            for pet in pets:
-                if pet.split('-')[1] in ['Spooky', 'Peppermint', 'Floral',
-                        'Thunderstorm', 'Ghost']:
-                    magic_pets.append(pet)
-
-            for food in foods:
-                # Handle seasonal foods that encode matching pet in name.
-                if '_' in food:
-                    best = food.split('_',1)[1]
-                    if not food in feeding:
-                        feeding[food] = best
-
-                # Skip foods we don't have any of.
-                if items['food'][food] <= 0:
-                    continue
+        user = state.user
+        items = user.get('items', [])
+        plan, foods, unwanted = plan_feeding(items)
 
-                # Find best pet to feed to.
-                suffix = feeding.get(food, None)
-                if suffix == None:
-                    print("Unknown food: %s" % (food))
-                    continue
-                if suffix == 'ignore':
-                    continue
+        failed = feed_pets(auth, plan)
+        before_user = user
+        user = state.refresh()
+        show_delta(state, before_user, user)
 
-                # Track attempted foods
-                attempted_foods.add(food)
-
-                mouth = find_pet_to_feed(pets, items, suffix, True)
-
-                # If we have food but its not ideal for pet, give it to a
-                # magic pet which will eat anything.
-                if not mouth:
-                    mouth = find_pet_to_feed(magic_pets, items, suffix, False)
-
-                if mouth:
-                    before = pets[mouth]
-
-                    # if the less than ideal food is fed to a pet it's satiety
-                    # increases by 1 not 5, so find the multiple of five.
-                    satiety = int(5 * round(pets[mouth]/5))
-                    # 50 is "fully fed and now a mount", 5 is best food growth
-                    need_bites = bites = (50 - satiety) / 5
-                    if items['food'][food] < bites:
-                        bites = items['food'][food]
-
-                    # Report how many more bites are needed before a mount.
-                    moar = ""
-                    if need_bites > bites:
-                        need_bites -= bites
-                        moar = " (needs %d more serving%s)" % (need_bites,
-                                "" if need_bites == 1 else "s")
-
-                    fed_foods.add(food)
-                    print("Feeding %d %s to %s%s" % (bites, nice_name(food),
-                                                   nice_name(mouth), moar))
-                    before_user = user
-                    feeder = api.Habitica(auth=auth, resource="user", aspect="feed")
-                    for i in range(int(bites)):
-                        feeder(_method='post', _one=mouth, _two=food)
-                    user = hbt.user()
-                    show_delta(hbt, before_user, user)
-                    refreshed = True
-                    items = user.get('items', [])
-                    pets = items['pets']
-                    if pets[mouth] == before:
-                        raise ValueError("failed to feed %s" % (mouth))
-                    break
-
-        for food in list(attempted_foods - fed_foods):
-            print("Nobody wants to eat %i %s" % (items['food'][food], nice_name(food)))
+        pets = user.get('items', [])['pets']
+        for step in plan:
+            if step['pet'] not in failed and \
+                    pets.get(step['pet']) == items['pets'][step['pet']]:
+                raise ValueError("failed to feed %s" % (step['pet']))
+
+        for food in unwanted:
+            print("Nobody wants to eat %i %s" % (foods[food], nice_name(food)))
 
     # Hatch all possible eggs (v3 ok)
     elif args['<command>'] == 'hatch':
-        def hatch_refresh(user):
-            items = user.get('items', [])
-            pets = items['pets']
-            mounts = items['mounts']
-            eggs = items['eggs']
-            potions = items['hatchingPotions']
-            return (items, pets, mounts, eggs, potions)
-
-        user = hbt.user()
-        refreshed = True
-
-        while refreshed:
-            refreshed = False
-            items, pets, mounts, eggs, potions = hatch_refresh(user)
-
-            for egg in eggs:
-                # Skip eggs we don't have.
-                if eggs[egg] == 0:
-                    continue
-
-                creatures = []
-                for kind in kinds:
-                    creatures.append('%s-%s' % (egg, kind))
-
-                for creature in creatures:
-                    # This pet is already hatched.
-                    if pets.get(creature, 0) > 0:
-                        continue
-
-                    # We ran out of eggs.
-                    if eggs[egg] == 0:
-                        continue
-
-                    potion = creature.split('-')[-1]
-                    # Missing the potion needed for this creature.
-                    if potion not in potions or potions[potion] < 1:
-                        print("Want to hatch a %s %s, but missing potion" %
-                              (potion, egg))
-                        continue
-
-                    print("Hatching a %s %s" % (nice_name(potion),
-                                                nice_name(egg)))
-                    before_user = user
-                    hatcher = api.Habitica(auth=auth, resource="user", aspect="hatch")
-                    hatcher(_method='post', _one=egg, _two=potion)
-                    user = hbt.user()
-                    show_delta(hbt, before_user, user)
-                    refreshed = True
-                    items, pets, mounts, eggs, potions = hatch_refresh(user)
-                    if pets.get(creature, 0) != 5:
-                        raise ValueError("failed to hatch %s" % (creature))
+        user = state.user
+        items = user.get('items', [])
+        hatches, missing, needs = plan_hatching(items,
+                                                settings['eggs-extra'])
+
+        for egg, potion in missing:
+            print("Want to hatch a %s %s, but missing potion" %
+                  (potion, egg))
+        for egg, potion in hatches:
+            print("Hatching a %s %s" % (nice_name(potion), nice_name(egg)))
+        hatcher = api.Habitica(auth=auth, resource="user", aspect="hatch")
+        # one after the other on the kept-alive session: each hatch
+        # rewrites the user's eggs, potions and pets on the server
+        results = run_concurrently(
+            [lambda egg=egg, potion=potion: hatcher(_method='post', _one=egg,
+                                                    _two=potion)
+             for egg, potion in hatches], 1)
+        failed = set()
+        for (egg, potion), (result, error) in zip(hatches, results):
+            if error is not None:
+                print("Failed to hatch a %s %s: %s" % (nice_name(potion),
+                                                       nice_name(egg), error))
+                failed.add((egg, potion))
 
         # How many eggs do we need for the future?
-        tosell = []
-        for egg in eggs:
-            need_pets = []
-            need_mounts = []
-
-            # Don't bother reporting about eggs we have none of.
-            if eggs[egg] == 0:
-                continue
-
-            creatures = []
-            for kind in kinds:
-                creatures.append('%s-%s' % (egg, kind))
-
-            for creature in creatures:
-                if mounts.get(creature, 0) == 0:
-                    name = nice_name(creature.split('-',1)[1])
-                    need_mounts.append(name)
-                if pets.get(creature, 0) < 5:
-                    need_pets.append(creature.split('-',1)[1])
-
-            report = ""
-            if len(need_pets):
-                report += "%d Pet%s (%s)" % (len(need_pets),
-                          "" if len(need_pets) == 1 else "s",
-                          ", ".join(need_pets))
-            if len(need_mounts):
-                if len(report):
-                    report += ", "
-                report += "%d Mount%s (%s)" % (len(need_mounts),
-                          "" if len(need_mounts) == 1 else "s",
-                          ", ".join(need_mounts))
-            if settings['eggs-extra']:
-                if len(report):
-                    report += ", "
-                report += "%d extra" % (settings['eggs-extra'])
-
-            need = len(need_pets) + len(need_mounts) + settings['eggs-extra']
+        tosell = OrderedDict()
+        for egg, need, report, sell in needs:
             if need and need != settings['eggs-extra']:
                 print("%s egg: Need %d for %s" % (nice_name(egg), need, report))
 
             # Sell unneeded eggs.
-            sell = eggs[egg] - need
             if sell > 0:
-                before = eggs[egg]
                 print("Selling %d %s egg%s" % (sell, nice_name(egg),
                                                "" if sell == 1 else "s"))
-                for i in range(sell):
-                    tosell.append(egg)
+                tosell[egg] = sell
 
         if len(tosell) > 0:
+            eggs = dict(items['eggs'])
+            for egg, potion in hatches:
+                if (egg, potion) not in failed:
+                    eggs[egg] -= 1
+            sell_items(auth, 'eggs', tosell, eggs)
+
+        # Reconcile with the server once, after everything is done.
+        if hatches or tosell:
             before_user = user
-            seller = api.Habitica(auth=auth, resource="user", aspect="sell")
-            for i in range(len(tosell)):
-                seller(_method='post', _one='eggs', _two=tosell[i])
-            user = hbt.user()
-            show_delta(hbt, before_user, user)
+            user = state.refresh()
+            show_delta(state, before_user, user)
+            pets = user.get('items', [])['pets']
+            for egg, potion in hatches:
+                creature = '%s-%s' % (egg, potion)
+                # those that failed were reported already
+                if (egg, potion) not in failed and \
+                        pets.get(creature, 0) != 5:
+                    raise ValueError("failed to hatch %s" % (creature))
 
     # Sell all unneeded hatching potions (v3 ok)
     elif args['<command>'] == 'sell':
@@ -1092,7 +2424,7 @@ def cli():
             name = args['<args>'].pop(arg)
             sell_max = int(args['<args>'].pop(arg))
 
-        user = hbt.user()
+        user = state.user
 
         selling = args['<args>']
         if len(selling) == 0:
@@ -1100,14 +2432,15 @@ def cli():
             sys.exit(0)
 
         if selling == ['all']:
-            selling = kinds
+            selling = KINDS
 
-        tosell = []
+        tosell = OrderedDict()
         items = user.get('items', [])
         stats = user.get('stats', [])
         potions = items['hatchingPotions']
+        owned = dict(potions)
         for sell in selling:
-            if sell not in kinds:
+            if sell not in KINDS:
                 print("\"%s\" isn't a valid kind of potion." % (sell))
                 sys.exit(1)
             if sell not in potions:
@@ -1128,15 +2461,12 @@ def cli():
                 print("Selling %d %s potion%s" % (potions[sell],
                         nice_name(sell),
                         "" if potions[sell] == 1 else "s"))
-                for i in range(potions[sell]):
-                    tosell.append(sell)
+                tosell[sell] = potions[sell]
         if len(tosell):
             before_user = user
-            seller = api.Habitica(auth=auth, resource="user", aspect="sell")
-            for i in range(len(tosell)):
-                seller(_method='post', _one='hatchingPotions', _two=tosell[i])
-            user = hbt.user()
-            show_delta(hbt, before_user, user)
+            sell_items(auth, 'hatchingPotions', tosell, owned)
+            user = state.refresh()
+            show_delta(state, before_user, user)
 
     # dump raw json for user (v3 ok)
     elif args['<command>'] == 'dump':
@@ -1150,11 +2480,11 @@ def cli():
 
         # Fetch stuff we need for multiple targets.
         if 'user' in wanted or 'food' in wanted or 'pets' in wanted or 'mounts' in wanted:
-            user = hbt.user()
+            user = state.user
         if 'food' in wanted or 'pets' in wanted or 'mounts' in wanted:
             items = user.get('items', [])
         if 'party' in wanted or 'members' in wanted:
-            party = hbt.groups.party()
+            party = get_party(hbt)
 
         # Add report details.
         if 'user' in wanted:
@@ -1171,14 +2501,14 @@ def cli():
         if 'mounts' in wanted:
             report['mounts'] = items['mounts']
         if 'content' in wanted:
-            report['content'] = hbt.content()
+            report['content'] = load_content(hbt).all()
 
         # Dump the report.
         print(json.dumps(report, indent=4, sort_keys=True))
 
     # cast/skill on task/self/party (v3 ok)
     elif args['<command>'] == 'cast':
-        user = hbt.user()
+        user = state.user
         stats = user.get('stats', '')
         uclass = stats['class']
 
@@ -1251,15 +2581,17 @@ def cli():
         before_user = user
         charclass = api.Habitica(auth=auth, resource="user", aspect="class")
         if task != '':
-            charclass(_method='post', _one='cast', _two=spell, targetId=task)
+            cast = charclass(_method='post', _one='cast', _two=spell,
+                             targetId=task)
         else:
-            charclass(_method='post', _one='cast', _two=spell)
-        user = hbt.user()
-        show_delta(hbt, before_user, user)
+            cast = charclass(_method='post', _one='cast', _two=spell)
+        if not show_payload_delta(state, before_user, [cast]):
+            user = state.refresh()
+            show_delta(state, before_user, user)
 
     # buy as many gems as possible (v3 ok)
     elif args['<command>'] == 'gems':
-        user = hbt.user()
+        user = state.user
         before_user = user
         # base of 25 + (5 * (months subscribed / 3)) which seems to be
         # gemCapExtra
@@ -1270,23 +2602,23 @@ def cli():
         purchaser = api.Habitica(auth=auth, resource="user", aspect="purchase")
         for i in range(gems):
             purchaser(_method='post', _one='gems', _two='gem')
-        user = hbt.user()
-        show_delta(hbt, before_user, user)
+        user = state.refresh()
+        show_delta(state, before_user, user)
 
     elif args['<command>'] == 'armoire':
-        user = hbt.user()
+        user = state.user
         before_user = user
         purchase = api.Habitica(auth=auth, resource="user",
                                 aspect="buy-armoire")
         received = purchase(_method='post')
         if 'dropText' in received['armoire']:
             print('Got ' + received['armoire']['dropText'] + '!')
-        show_delta(hbt, before_user, user)
+        show_delta(state, before_user, user)
 
     #Quest manipulations
     elif args['<command>'] == 'quest':
         # if on a quest with the party, grab quest info
-        user = hbt.user()
+        user = state.user
         group = hbt.groups(type='party')
         if not group:
             print('You are not in any party. No quests available.')
@@ -1296,11 +2628,10 @@ def cli():
         if quest_data and 'key' in quest_data.keys():
             quest_key = quest_data['key']
 
-            if cache.get(SECTION_CACHE_QUEST, 'quest_key') != quest_key:
-                get_quest_info(hbt, quest_key)
+            quest_type, quest_max, quest_title = get_quest_info(
+                hbt, quest_key, cache)
 
             # now we use /party and quest_type to figure out our progress!
-            quest_type = cache.get(SECTION_CACHE_QUEST, 'quest_type')
             if quest_type == 'collect' and quest_data['active']:
                 qp_tmp = quest_data['progress']['collect']
                 if type(qp_tmp) is not dict:
@@ -1310,21 +2641,22 @@ def cli():
             elif quest_data['active']:
                 quest_progress = quest_data['progress']['hp']
             else:
-                quest_progress = cache.get(SECTION_CACHE_QUEST, 'quest_max')
+                quest_progress = quest_max
 
             if quest_data['active']:
                 quest = '"%s" - %s/%s (-%s)' % (
-                        cache.get(SECTION_CACHE_QUEST, 'quest_title'),
+                        quest_title,
                         str(int(quest_progress)),
-                        cache.get(SECTION_CACHE_QUEST, 'quest_max'),
+                        quest_max,
                         str(int(user['party']['quest']['progress']['up'])))
 
             else:
                 quest = '%s "%s"' % (
                             'Preparing',
-                            cache.get(SECTION_CACHE_QUEST, 'quest_title'))
+                            quest_title)
 
-            groupUserStatus = group_user_status(quest_data, auth, hbt)
+            groupUserStatus = group_user_status(quest_data, auth, hbt,
+                                                settings['workers'], cache)
 
             len_ljust = 6
             print('%s %s' % ('Quest:'.rjust(len_ljust, ' '), quest))
@@ -1340,8 +2672,9 @@ def cli():
                         print('Aborting force start.')
                     else:
                         party = api.Habitica(auth=auth, resource='groups', aspect='party')
-                        quest_data = party(_method='post', _one='quests', _two='force-start')
-                        if quest_data == None:
+                        try:
+                            party(_method='post', _one='quests', _two='force-start')
+                        except api.requests.exceptions.HTTPError:
                             print('Could not force-start the quest!')
 
             if 'accept' in args['<args>']:
@@ -1349,8 +2682,9 @@ def cli():
                     print('Can\'t accept: Quest is already active.')
                 else:
                     party = api.Habitica(auth=auth, resource='groups', aspect='party')
-                    quest_data = party(_method='post', _one='quests', _two='accept')
-                    if quest_data == None:
+                    try:
+                        party(_method='post', _one='quests', _two='accept')
+                    except api.requests.exceptions.HTTPError:
                         print('Error accepting the quest! (already accepted?)')
                     else:
                         print('Accepted quest invitation!')
@@ -1370,7 +2704,7 @@ def cli():
             name = 'pet'
             verb = 'walking with'
 
-        user = hbt.user()
+        user = state.user
         items = user.get('items', [])
         animals = items[item_type]
 
@@ -1400,7 +2734,7 @@ def cli():
     # equip a set of equipment (v3 ok)
     elif args['<command>'] == 'equip':
         equipping = args['<args>']
-        user = hbt.user()
+        user = state.user
         before_user = user
         items = user.get('items', [])
         equipped = items['gear']['equipped']
@@ -1408,12 +2742,12 @@ def cli():
         equiper = batch = api.Habitica(auth=auth, resource="user", aspect="equip")
         for equipment in equipping:
             equiper(_method='post', _one='equipped', _two=equipment)
-        user = hbt.user()
-        show_delta(hbt, before_user, user)
+        user = state.refresh()
+        show_delta(state, before_user, user)
 
     # sleep/wake up (v3 ok)
     elif args['<command>'] == 'sleep' or args['<command>'] == 'arise':
-        user = hbt.user()
+        user = state.user
         intent = args['<command>']
         sleeping = user['preferences']['sleep']
         if intent == 'sleep' and sleeping:
@@ -1428,11 +2762,14 @@ def cli():
 
     # GET user status (v3 ok)
     elif args['<command>'] == 'status':
+        import dateutil.parser
+        import humanize
+        import pytz
 
         # gather status info
-        user = hbt.user()
+        user = state.user
         guilds = user.get('guilds')
-        party = hbt.groups.party()
+        party = get_party(hbt)
         stats = user.get('stats', '')
         group = hbt.groups(type='party')
         items = user.get('items', '')
@@ -1451,11 +2788,10 @@ def cli():
 
             quest_key = party['quest']['key']
 
-            if cache.get(SECTION_CACHE_QUEST, 'quest_key') != quest_key:
-                get_quest_info(hbt, quest_key)
+            quest_type, quest_max, quest_title = get_quest_info(
+                hbt, quest_key, cache)
 
             # now we use /party and quest_type to figure out our progress!
-            quest_type = cache.get(SECTION_CACHE_QUEST, 'quest_type')
             if quest_type == 'collect' and party['quest']['active']:
                 qp_tmp = party['quest']['progress']['collect']
                 if type(qp_tmp) is not dict:
@@ -1465,19 +2801,19 @@ def cli():
             elif party['quest']['active']:
                 quest_progress = party['quest']['progress']['hp']
             else:
-                quest_progress = cache.get(SECTION_CACHE_QUEST, 'quest_max')
+                quest_progress = quest_max
 
             if party['quest']['active']:
                 quest = '"%s" - %s/%s (-%s)' % (
-                            cache.get(SECTION_CACHE_QUEST, 'quest_title'),
+                            quest_title,
                             str(int(quest_progress)),
-                            cache.get(SECTION_CACHE_QUEST, 'quest_max'),
+                            quest_max,
                             str(int(user['party']['quest']['progress']['up'])))
 
             else:
                 quest = '%s "%s"' % (
                             'Preparing',
-                            cache.get(SECTION_CACHE_QUEST, 'quest_title'))
+                            quest_title)
 
 
         egg_count = sum(items['eggs'].values())
@@ -1505,7 +2841,7 @@ def cli():
         if not mount:
             mount = DEFAULT_MOUNT
 
-        members = get_members(auth, party)
+        members = get_members(auth, party, settings['workers'], cache)
         summary_items = ('health', 'xp', 'mana', 'currency', 'perishables',
                          'quest', 'pet', 'mount', 'group')
         len_ljust = max(map(len, summary_items)) + 1
@@ -1586,7 +2922,7 @@ def cli():
 
     # GET/POST habits (v3 ok)
     elif args['<command>'] == 'habits':
-        habits = hbt.tasks.user(type='habits')
+        store = TaskStore(cache)
         direction = None
         if 'up' in args['<args>']:
             report = 'incremented'
@@ -1595,29 +2931,38 @@ def cli():
             report = 'decremented'
             direction = 'down'
 
-        if direction != None:
-            before_user = hbt.user()
+        if direction == None:
+            habits = load_tasks(hbt, store, 'habits')
+        else:
+            batch = Batch(auth, settings['workers'], outbox,
+                          settings['outbox'])
+            habits = shown_tasks(hbt, store, 'habits', batch)
+            before_user = None if batch.deferred else state.snapshot()
             tids = get_task_ids(args['<args>'][1:])
             for tid in tids:
+                batch.score(habits[tid], direction)
+            results = batch.submit()
+            for tid, (result, error) in zip(tids, results):
+                if error is not None:
+                    print('failed to score habit \'%s\': %s'
+                          % (habits[tid]['text'], error))
+                    continue
+                state.apply_score(result)
                 tval = habits[tid]['value']
-                habit = api.Habitica(auth=auth, resource="tasks", aspect=habits[tid]['id'])
-                habit(_method='post', _one='score', _two=direction)
                 print('%s habit \'%s\''
                       % (report, habits[tid]['text'])) #.encode('utf8')))
                 if direction == 'up':
                     habits[tid]['value'] = tval + (TASK_VALUE_BASE ** tval)
                 else:
                     habits[tid]['value'] = tval - (TASK_VALUE_BASE ** tval)
-                #sleep(HABITICA_REQUEST_WAIT_TIME)
-            show_delta(hbt, before_user, hbt.user())
+            store.sync(auth['x-api-user'], 'habits', habits, force=True)
+            show_batch_delta(state, before_user, batch, results)
 
-        for i, task in enumerate(habits):
-            score = qualitative_task_score_from_value(task['value'])
-            print('[%s] %s %s' % (score, i + 1, task['text'])) #.encode('utf8')))
+        show_tasks(hbt, store, 'habits', habits)
 
     # GET/PUT tasks:daily (v3 ok)
     elif args['<command>'] == 'dailies':
-        dailies = hbt.tasks.user(type='dailys')
+        store = TaskStore(cache)
         direction = None
         if 'done' in args['<args>']:
             report = 'completed'
@@ -1626,82 +2971,110 @@ def cli():
             report = 'incomplete'
             direction = 'down'
 
-        if direction != None:
-            before_user = hbt.user()
+        batch = None
+        if direction == None:
+            dailies = load_tasks(hbt, store, 'dailys')
+        else:
+            batch = Batch(auth, settings['workers'], outbox,
+                          settings['outbox'])
+            dailies = shown_tasks(hbt, store, 'dailys', batch)
+            before_user = None if batch.deferred else state.snapshot()
             tids = get_task_ids(args['<args>'][1:])
+            calls = []
             for tid in tids:
                 checklistItem = isChecklistItem(tid)
                 if checklistItem == False:
-                    daily = api.Habitica(auth=auth, resource="tasks", aspect=dailies[tid]['id'])
-                    daily(_method='post', _one='score', _two=direction)
-                    print('marked daily \'%s\' %s'
-                          % (dailies[tid]['text'], report)) #.encode('utf8'))) - for the first string
-                    if direction == 'up':
-                        dailies[tid]['completed'] = True
-                    else:
-                        dailies[tid]['completed'] = False
-                    #sleep(HABITICA_REQUEST_WAIT_TIME)
+                    calls.append((tid, None))
+                    batch.score(dailies[tid], direction)
                 elif checklistItem == None:
                     print('Could not parse argument \'%s\' - ignoring it!' % tid)
                 else:
-                    checklist = api.Habitica(auth=auth, resource="tasks",
-                                             aspect=dailies[checklistItem[0]]['id'])
+                    calls.append(checklistItem)
+                    batch.score_checklist(dailies[checklistItem[0]],
+                                          checklistItem[1])
+            results = batch.submit()
+            for (tid, item), (result, error) in zip(calls, results):
+                if item is None:
+                    if error is not None:
+                        print('failed to mark daily \'%s\' %s: %s'
+                              % (dailies[tid]['text'], report, error))
+                        continue
+                    print('marked daily \'%s\' %s'
+                          % (dailies[tid]['text'], report)) #.encode('utf8'))) - for the first string
+                    dailies[tid]['completed'] = direction == 'up'
+                    state.apply_score(result)
+                else:
+                    check = dailies[tid]['checklist'][item]
+                    if error is not None:
+                        print('failed to toggle checklist item \'%s\' of '
+                              'daily \'%s\': %s'
+                              % (check['text'], dailies[tid]['text'], error))
+                        continue
                     print('toggled checklist item \'%s\' of daily \'%s\''
-                          % (dailies[checklistItem[0]]['checklist'][checklistItem[1]]['text'],
-                             dailies[checklistItem[0]]['text']))
-                    checklist(_method='post', _one='checklist',
-                        _two=dailies[checklistItem[0]]['checklist'][checklistItem[1]]['id'] + '/score')
-                    dailies[checklistItem[0]]['checklist'][checklistItem[1]]['completed'] = \
-                        not dailies[checklistItem[0]]['checklist'][checklistItem[1]]['completed']
-            user = hbt.user()
-            show_delta(hbt, before_user, user)
-
-        # avoid additional API call if possible
-        try:
-            user
-        except NameError:
-            user = hbt.user()
+                          % (check['text'], dailies[tid]['text']))
+                    check['completed'] = not check['completed']
+            store.sync(auth['x-api-user'], 'dailys', dailies, force=True)
+            show_batch_delta(state, before_user, batch, results)
 
-        if user['needsCron']:
+        needsCron = needs_cron(hbt, store, state, batch)
+        if needsCron:
             yesterdayMessage = ('You left these Dailies unchecked yesterday! '
                                 'Do you want to check off any of them now? When you\'re done, start a new '
                                 'day using \'habitica newday\'!')
             print('-' * min(len(yesterdayMessage), settings['print-width']))
             print(textwrap.fill(yesterdayMessage, width=settings['print-width']))
             print('-' * min(len(yesterdayMessage), settings['print-width']))
-        print_task_list(dailies, needsCron=user['needsCron'])
+        show_tasks(hbt, store, 'dailys', dailies, needsCron=needsCron)
 
     # handle todo items (v3 ok)
     elif args['<command>'] == 'todos':
-        todos = [e for e in hbt.tasks.user(type='todos')
-                 if not e['completed']]
+        store = TaskStore(cache)
+        batch = Batch(auth, settings['workers'], outbox, settings['outbox'])
+        if set(args['<args>'][:1]) & set(['done', 'delete']):
+            todos = shown_tasks(hbt, store, 'todos', batch)
+        elif args['<args>'][:1] == ['get']:
+            todos = shown_tasks(hbt, store, 'todos')
+        elif args['<args>'][:1] != ['import']:
+            todos = load_tasks(hbt, store, 'todos')
         if 'done' in args['<args>']:
-            before_user = hbt.user()
-            tids = get_task_ids(args['<args>'][1:])
-            for tid in tids:
+            before_user = None if batch.deferred else state.snapshot()
+            calls = []
+            for tid in get_task_ids(args['<args>'][1:]):
                 checklistItem = isChecklistItem(tid)
                 if checklistItem == False:
-                    todo = api.Habitica(auth=auth, resource="tasks", aspect=todos[tid]['id'])
-                    todo(_method='post', _one='score', _two='up')
-                    print('marked todo \'%s\' complete'
-                          % todos[tid]['text']) #.encode('utf8'))
-                    #sleep(HABITICA_REQUEST_WAIT_TIME)
+                    calls.append((tid, None))
+                    batch.score(todos[tid], 'up')
                 elif checklistItem == None:
                     print('Could not parse argument \'%s\' - ignoring it!' % tid)
-                    tids.remove(tid)
                 else:
-                    checklist = api.Habitica(auth=auth, resource="tasks",
-                                             aspect=todos[checklistItem[0]]['id'])
+                    calls.append(checklistItem)
+                    batch.score_checklist(todos[checklistItem[0]],
+                                          checklistItem[1])
+            results = batch.submit()
+            tids = []
+            for (tid, item), (result, error) in zip(calls, results):
+                if item is None:
+                    if error is not None:
+                        print('failed to mark todo \'%s\' complete: %s'
+                              % (todos[tid]['text'], error))
+                        continue
+                    print('marked todo \'%s\' complete'
+                          % todos[tid]['text']) #.encode('utf8'))
+                    tids.append(tid)
+                    state.apply_score(result)
+                else:
+                    check = todos[tid]['checklist'][item]
+                    if error is not None:
+                        print('failed to toggle checklist item \'%s\' of '
+                              'todo \'%s\': %s'
+                              % (check['text'], todos[tid]['text'], error))
+                        continue
                     print('toggled checklist item \'%s\' of daily \'%s\''
-                          % (todos[checklistItem[0]]['checklist'][checklistItem[1]]['text'],
-                             todos[checklistItem[0]]['text']))
-                    checklist(_method='post', _one='checklist',
-                        _two=todos[checklistItem[0]]['checklist'][checklistItem[1]]['id'] + '/score')
-                    todos[checklistItem[0]]['checklist'][checklistItem[1]]['completed'] = \
-                        not todos[checklistItem[0]]['checklist'][checklistItem[1]]['completed']
-                    tids.remove(tid)
+                          % (check['text'], todos[tid]['text']))
+                    check['completed'] = not check['completed']
             todos = updated_task_list(todos, tids)
-            show_delta(hbt, before_user, hbt.user())
+            store.sync(auth['x-api-user'], 'todos', todos, force=True)
+            show_batch_delta(state, before_user, batch, results)
         elif 'get' in args['<args>']:
             tids = get_task_ids(args['<args>'][1:])
             for tid in tids:
@@ -1710,28 +3083,57 @@ def cli():
                 print(json.dumps({'todo':obj}, indent=4, sort_keys=True))
         elif 'add' in args['<args>']:
             ttext = ' '.join(args['<args>'][1:])
-            hbt.tasks.user(type='todo',
-                           text=ttext,
-                           priority=PRIORITY[args['--difficulty']],
-                           _method='post')
-            todos.insert(0, {'completed': False, 'text': ttext, 'type': 'todo'})
+            task = batch.add(type='todo', text=ttext,
+                             priority=PRIORITY[args['--difficulty']])
+            (todo, error), = batch.submit()
+            if error is not None:
+                raise error
+            if todo is None and 'alias' in task:
+                # queued: its alias stands in for the id until it's sent
+                todo = dict(task, id=task['alias'], completed=False)
+            todos.insert(0, todo or {'completed': False, 'text': ttext,
+                                     'type': 'todo'})
+            if 'id' in todos[0]:
+                store.sync(auth['x-api-user'], 'todos', todos)
             print('added new todo \'%s\'' % ttext)
+        elif args['<args>'][:1] == ['import']:
+            source = args['<args>'][1] if len(args['<args>']) > 1 else '-'
+            priority = PRIORITY[args['--difficulty']]
+            if source == '-':
+                created = import_todos(auth, cache, 'stdin', sys.stdin,
+                                       priority)
+            else:
+                with open(source) as lines:
+                    created = import_todos(auth, cache,
+                                           os.path.abspath(source), lines,
+                                           priority)
+            print('imported %d todo%s' % (created,
+                                          '' if created == 1 else 's'))
+            return
         elif 'delete' in args['<args>']:
-            tids = get_task_ids(args['<args>'][1:])
-            for tid in tids:
-                todo = api.Habitica(auth=auth, resource="tasks", aspect=todos[tid]['id'])
-                todo(_method='delete')
+            # requests are paced by api.RateLimiter, no need to sleep
+            requested = get_task_ids(args['<args>'][1:])
+            for tid in requested:
+                batch.delete(todos[tid])
+            results = batch.submit()
+            tids = []
+            for tid, (result, error) in zip(requested, results):
+                if error is not None:
+                    print('failed to delete todo \'%s\': %s'
+                          % (todos[tid]['text'], error))
+                    continue
                 print('deleted todo \'%s\''
                       % todos[tid]['text'])
-                sleep(HABITICA_REQUEST_WAIT_TIME)
+                tids.append(tid)
             todos = updated_task_list(todos, tids)
-        print_task_list(todos)
+            store.sync(auth['x-api-user'], 'todos', todos, force=True)
+        show_tasks(hbt, store, 'todos', todos)
 
     elif args['<command>'] == 'chat':
         # Interface to party and guild chats
-        user = hbt.user()
+        user = state.user
         guilds = user.get('guilds')
-        groups = hbt.groups.party()
+        groups = get_party(hbt)
 
         # List available chat IDs to use with show and send args
         # party is always 0
@@ -1740,37 +3142,19 @@ def cli():
                 alert = '(!)' if groups['id'] in user['newMessages'].keys() else ''
                 print('0 %s %s' % (groups['name'], alert))
 
-            # use cache if possible and younger than 1 week
-            if 'timestamp' in cache['Guildnames'].keys() and \
-             time() - float(cache['Guildnames']['timestamp']) < 604800:
-
-                for i in range(len(guilds)):
-                    alert = '(!)' if guilds[i] in user['newMessages'].keys() else ''
-                    try:
-                        name = cache.get(SECTION_CACHE_GUILDNAMES, guilds[i])
-                    except configparser.NoOptionError:
-                        # name not yet cached
-                        guild = getattr(hbt.groups, guilds[i])()
-                        name = guild['name']
-                        name += ' -?-' if guild['memberCount'] > 5000 else ''
-                        cache = update_guildnames_cache(CACHE_CONF,
-                                               number=guilds[i],
-                                               name=name)
-                    print('%d %s %s' % (i + 1, name, alert))
-
-            else:
-                cache = update_guildnames_cache(CACHE_CONF,
-                                          number='timestamp',
-                                          name=str(time()))
-                for i in range(len(guilds)):
-                    alert = '(!)' if guilds[i] in user['newMessages'].keys() else ''
+            # cached guild names expire after GUILDNAMES_TTL
+            for i in range(len(guilds)):
+                alert = '(!)' if guilds[i] in user['newMessages'].keys() else ''
+                name = cache.get(SECTION_CACHE_GUILDNAMES, guilds[i])
+                if name is None:
+                    # name not (or no longer) cached
                     guild = getattr(hbt.groups, guilds[i])()
                     name = guild['name']
                     name += ' -?-' if guild['memberCount'] > 5000 else ''
-                    cache = update_guildnames_cache(CACHE_CONF,
-                                               number=guilds[i],
-                                               name=name)
-                    print('%d %s %s' % (i + 1, name, alert))
+                    update_guildnames_cache(cache, number=guilds[i],
+                                            name=name)
+                print('%d %s %s' % (i + 1, name, alert))
+            cache.commit()
             print('-' * 53)
             print('-?- can\'t send notifications (more than 5000 members)'
                   '\n(!) new message')
@@ -1831,11 +3215,12 @@ def cli():
     # moving to the next day
     # needed to fully implement 'recording yesterday's activity'
     elif args['<command>'] == 'newday':
-        user = hbt.user()
+        user = state.user
         if user['needsCron']:
             print('Moving to the current day ...')
             newday = hbt.cron(data="none", _method="post")
-            show_delta(hbt, user, hbt.user())
+            TaskStore(cache).set_needs_cron(auth['x-api-user'], False)
+            show_delta(state, user, state.refresh())
         else:
             print('We\'re already working the current day. Doing nothing!')
 
@@ -12,10 +12,14 @@ setup(
     license='LICENSE.txt',
     description='Commandline interface to Habitica (http://habitica.com)',
     long_description=readme,
-    packages=find_packages(exclude=('dist', 'tests')),
+    packages=find_packages(exclude=('dist', 'tests', 'benchmarks')),
     install_requires=[
         'docopt',
         'requests',
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'json': ['orjson', 'ijson'],
+    },
     scripts=['bin/habitica'],
 )
@@ -0,0 +1,96 @@
+"""
+A scripted stand-in for the Habitica server, on http.server, for tests
+that need real HTTP round trips.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from habitica import api
+
+DROP = 'drop'  # close the connection without answering
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; without this a
+    # kept-alive connection waits on delayed ACKs between responses
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, body,
+                                    time.time()))
+            reply = server.script.pop(0) if server.script else 200
+        if reply == DROP:
+            self.close_connection = True
+            return
+        status, headers = reply if isinstance(reply, tuple) else (reply, {})
+        data = json.dumps({'success': status < 400,
+                           'data': {'status': status}}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = answer
+
+
+class StubServer(object):
+    """
+    Answers requests with the statuses in script, in order, then with
+    200s. A script entry is a status, a (status, headers) pair or DROP.
+    The requests received are kept in `requests`.
+    """
+
+    def __init__(self, *script):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.lock = threading.Lock()
+        self.httpd.script = list(script)
+        self.httpd.requests = []
+        self.url = 'http://127.0.0.1:%d' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       args=(0.05,), daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def client(self, user='test-user'):
+        """A Habitica handle for this server, on a session of its own."""
+        auth = {'url': self.url, 'x-api-user': user, 'x-api-key': 'key'}
+        return api.Habitica(auth=auth, session=api.make_session())
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ApiTestCase(object):
+    """Mixin giving each test fresh limiters and circuits, and short waits."""
+
+    def setUp(self):
+        self.saved = (api.API_BACKOFF_BASE, api.API_BACKOFF_MAX)
+        api.API_BACKOFF_BASE, api.API_BACKOFF_MAX = 0.01, 1.0
+        api._limiters.clear()
+        api._circuits.clear()
+
+    def tearDown(self):
+        api.API_BACKOFF_BASE, api.API_BACKOFF_MAX = self.saved
+        api._limiters.clear()
+        api._circuits.clear()
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+from habitica import api
+
+from .stub import DROP, ApiTestCase, StubServer
+
+
+@unittest.skipIf(api.optional('aiohttp') is None, 'needs aiohttp')
+class AsyncHabiticaTest(ApiTestCase, unittest.TestCase):
+
+    def call(self, server, **kwargs):
+        """Make one request of server with AsyncHabitica's user()."""
+        auth = {'url': server.url, 'x-api-user': 'test-user'}
+
+        async def run():
+            async with api.AsyncHabitica(auth=auth) as hbt:
+                return await hbt.user(**kwargs)
+        return asyncio.run(run())
+
+    def test_success(self):
+        with StubServer() as server:
+            self.assertEqual(self.call(server), {'status': 200})
+
+    def test_error_is_not_retried(self):
+        aiohttp = api.optional('aiohttp')
+        with StubServer(404) as server:
+            with self.assertRaises(aiohttp.ClientResponseError):
+                self.call(server)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_unavailable_then_up(self):
+        with StubServer(503, 502) as server:
+            self.assertEqual(self.call(server), {'status': 200})
+        self.assertEqual(len(server.requests), 3)
+
+    def test_bad_gateway_post_is_not_retried(self):
+        aiohttp = api.optional('aiohttp')
+        with StubServer(502) as server:
+            with self.assertRaises(aiohttp.ClientResponseError):
+                self.call(server, _method='post')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_long_retry_after_fails(self):
+        aiohttp = api.optional('aiohttp')
+        for status in (429, 503):
+            with StubServer((status, {'Retry-After': 3600})) as server:
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    self.call(server)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_429_is_retried_after_retry_after(self):
+        with StubServer((429, {'Retry-After': 0.2})) as server:
+            self.assertEqual(self.call(server), {'status': 200})
+        self.assertEqual(len(server.requests), 2)
+
+    def test_dropped_get_is_retried(self):
+        with StubServer(DROP) as server:
+            self.assertEqual(self.call(server), {'status': 200})
+        self.assertEqual(len(server.requests), 2)
+
+    def test_dropped_post_is_not_retried(self):
+        aiohttp = api.optional('aiohttp')
+        with StubServer(DROP) as server:
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                self.call(server, _method='post')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_retries_are_recorded(self):
+        records = []
+        api.hooks.append(records.append)
+        try:
+            with StubServer(503) as server:
+                self.call(server)
+        finally:
+            api.hooks.remove(records.append)
+        self.assertEqual(records[0]['retries'], 1)
+        self.assertEqual(records[0]['endpoint'], 'user')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from habitica.cache import ContentCache, write_atomic
+
+from .stub import ApiTestCase, StubServer
+
+
+class WriteAtomicTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'quests.json.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_threads_writing_one_file(self):
+        errors = []
+
+        def write(i):
+            try:
+                for _ in range(50):
+                    write_atomic(self.path, b'%d' % i * 10000)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(i,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.dir), ['quests.json.gz'])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(len(set(f.read())), 1)
+
+
+class ContentCacheTest(ApiTestCase, unittest.TestCase):
+
+    def setUp(self):
+        ApiTestCase.setUp(self)
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        ApiTestCase.tearDown(self)
+        shutil.rmtree(self.dir)
+
+    def test_threads_refresh_once(self):
+        with StubServer() as server:
+            cache = ContentCache(server.client(), self.dir)
+            threads = [threading.Thread(target=cache.refresh)
+                       for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(cache['status'], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import time
+import unittest
+
+from habitica import api
+
+from .stub import ApiTestCase, StubServer
+
+
+class ParseRateResetTest(unittest.TestCase):
+
+    def test_seconds_from_now(self):
+        self.assertEqual(api.parse_rate_reset('5', now=100.0), 105.0)
+
+    def test_epoch_seconds_and_milliseconds(self):
+        self.assertEqual(api.parse_rate_reset('1600000000', now=0),
+                         1600000000)
+        self.assertEqual(api.parse_rate_reset('1600000000000', now=0),
+                         1600000000.0)
+
+    def test_javascript_date(self):
+        value = 'Sun Sep 13 2020 12:26:40 GMT+0000 (Coordinated Universal Time)'
+        self.assertEqual(api.parse_rate_reset(value), 1600000000.0)
+
+    def test_unparsable(self):
+        self.assertIsNone(api.parse_rate_reset('soon'))
+        self.assertIsNone(api.parse_rate_reset(None))
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_reserve_until_empty(self):
+        limiter = api.RateLimiter(limit=2, period=60.0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertAlmostEqual(limiter.reserve(), 30.0, delta=0.5)
+
+    def test_update_takes_remaining_and_reset(self):
+        limiter = api.RateLimiter(limit=30, period=60.0)
+        limiter.update({'X-RateLimit-Limit': '30',
+                        'X-RateLimit-Remaining': '0',
+                        'X-RateLimit-Reset': str(time.time() + 10)})
+        self.assertAlmostEqual(limiter.reserve(), 10, delta=0.5)
+
+    def test_update_without_headers(self):
+        limiter = api.RateLimiter(limit=30, period=60.0)
+        limiter.update({})
+        self.assertEqual(limiter.reserve(), 0)
+
+    def test_throttled_waits_for_retry_after(self):
+        limiter = api.RateLimiter(limit=30, period=60.0)
+        limiter.throttled({'Retry-After': '10'})
+        self.assertAlmostEqual(limiter.reserve(), 10, delta=0.5)
+
+
+class PacingTest(ApiTestCase, unittest.TestCase):
+
+    def test_waits_for_reset_when_none_remain(self):
+        headers = {'X-RateLimit-Remaining': 0,
+                   'X-RateLimit-Reset': time.time() + 0.5}
+        with StubServer((200, headers)) as server:
+            hbt = server.client()
+            hbt.user()
+            hbt.user()
+        sent = [request[3] for request in server.requests]
+        self.assertGreaterEqual(sent[1] - sent[0], 0.3)
+
+    def test_429_is_retried_after_retry_after(self):
+        with StubServer((429, {'Retry-After': 0.3})) as server:
+            self.assertEqual(server.client().user(), {'status': 200})
+        sent = [request[3] for request in server.requests]
+        self.assertEqual(len(sent), 2)
+        self.assertGreaterEqual(sent[1] - sent[0], 0.2)
+
+    def test_limiter_is_shared_per_user(self):
+        self.assertIs(api.get_limiter('a'), api.get_limiter('a'))
+        self.assertIsNot(api.get_limiter('a'), api.get_limiter('b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
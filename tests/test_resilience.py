@@ -0,0 +1,192 @@
+import socket
+import time
+import unittest
+
+import requests
+
+from habitica import api
+
+from .stub import DROP, ApiTestCase, StubServer
+
+
+class StatusTest(ApiTestCase, unittest.TestCase):
+
+    def test_success(self):
+        for status in api.HTTP_SUCCESS:
+            with StubServer(status) as server:
+                self.assertEqual(server.client().user(), {'status': status})
+
+    def test_errors_are_not_retried(self):
+        for status in (404, 500):
+            with StubServer(status) as server:
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    server.client().user()
+            self.assertEqual(len(server.requests), 1)
+
+    def test_unavailable_then_up(self):
+        with StubServer(503, 503) as server:
+            hbt = server.client()
+            self.assertEqual(hbt.user(), {'status': 200})
+        self.assertEqual(len(server.requests), 3)
+
+    def test_bad_gateway_retried_for_get_only(self):
+        with StubServer(502) as server:
+            server.client().user()
+        self.assertEqual(len(server.requests), 2)
+        with StubServer(502) as server:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                server.client().tasks.user(_method='post', text='x')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_gives_up_after_retries(self):
+        with StubServer(*[503] * (api.API_RETRIES + 1)) as server:
+            with self.assertRaises(requests.exceptions.HTTPError):
+                server.client().user()
+        self.assertEqual(len(server.requests), api.API_RETRIES + 1)
+
+    def test_long_retry_after_fails(self):
+        for status in (429, 503):
+            with StubServer((status, {'Retry-After': 3600})) as server:
+                started = time.time()
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    server.client().user()
+            self.assertLess(time.time() - started, 1)
+            self.assertEqual(len(server.requests), 1)
+
+    def test_long_429_leaves_limiter_alone(self):
+        with StubServer((429, {'Retry-After': 3600})) as server:
+            hbt = server.client()
+            with self.assertRaises(requests.exceptions.HTTPError):
+                hbt.user()
+            self.assertEqual(hbt.user(), {'status': 200})
+
+    def test_retries_are_recorded(self):
+        records = []
+        api.hooks.append(records.append)
+        try:
+            with StubServer(503) as server:
+                server.client().tasks.user(_id='0e5b0c3f-8ad1-4c2d-9a7e-'
+                                           '6f3b2a1c9d0e')
+        finally:
+            api.hooks.remove(records.append)
+        self.assertEqual(records[0]['retries'], 1)
+        self.assertEqual(records[0]['status'], 200)
+        self.assertEqual(records[0]['endpoint'], 'tasks/user/:arg')
+
+    def test_endpoint_by_route_shape(self):
+        task = '0e5b0c3f-8ad1-4c2d-9a7e-6f3b2a1c9d0e'
+        self.assertEqual(api.endpoint({'route': ('tasks', task, 2)}),
+                         'tasks/:id/:arg/:arg')
+        self.assertEqual(api.endpoint({'route': ('user', 'feed', 2)}),
+                         'user/feed/:arg/:arg')
+        self.assertEqual(api.endpoint({'route': ('user', None, 0)}), 'user')
+
+
+class ConnectionTest(ApiTestCase, unittest.TestCase):
+
+    def test_dropped_get_is_retried(self):
+        with StubServer(DROP) as server:
+            self.assertEqual(server.client().user(), {'status': 200})
+        self.assertEqual(len(server.requests), 2)
+
+    def test_dropped_post_is_not_retried(self):
+        with StubServer(DROP) as server:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                server.client().tasks.user(_method='post', text='x')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_refused_is_unsent(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        auth = {'url': 'http://127.0.0.1:%d' % port, 'x-api-user': 'u'}
+        hbt = api.Habitica(auth=auth, session=api.make_session())
+        try:
+            hbt.tasks.user(_method='post', text='x')
+        except requests.exceptions.ConnectionError as e:
+            self.assertTrue(api.unsent(e))
+        else:
+            self.fail('ConnectionError not raised')
+
+    def test_dropped_is_not_unsent(self):
+        with StubServer(DROP) as server:
+            try:
+                server.client().tasks.user(_method='post', text='x')
+            except requests.exceptions.ConnectionError as e:
+                self.assertFalse(api.unsent(e))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_failures(self):
+        circuit = api.CircuitBreaker(failures=2, cooldown=60)
+        circuit.failure()
+        circuit.check()
+        circuit.failure()
+        with self.assertRaises(api.CircuitOpenError):
+            circuit.check()
+
+    def test_success_resets_count(self):
+        circuit = api.CircuitBreaker(failures=2, cooldown=60)
+        circuit.failure()
+        circuit.success()
+        circuit.failure()
+        circuit.check()
+
+    def test_probe_after_cooldown(self):
+        circuit = api.CircuitBreaker(failures=1, cooldown=0.1)
+        circuit.failure()
+        time.sleep(0.15)
+        circuit.check()
+        # only one probe at a time
+        with self.assertRaises(api.CircuitOpenError):
+            circuit.check()
+        circuit.success()
+        circuit.check()
+
+    def test_open_circuit_fails_fast(self):
+        api.API_RETRIES, saved = 0, api.API_RETRIES
+        try:
+            with StubServer(*[503] * api.API_CIRCUIT_FAILURES) as server:
+                hbt = server.client()
+                for i in range(api.API_CIRCUIT_FAILURES):
+                    with self.assertRaises(requests.exceptions.HTTPError):
+                        hbt.user()
+                with self.assertRaises(api.CircuitOpenError):
+                    hbt.user()
+        finally:
+            api.API_RETRIES = saved
+            api._circuits.clear()
+        self.assertEqual(len(server.requests), api.API_CIRCUIT_FAILURES)
+
+
+class BackoffTest(ApiTestCase, unittest.TestCase):
+
+    def test_exponential_and_capped(self):
+        for attempt in range(10):
+            wait = api.backoff(attempt)
+            self.assertGreaterEqual(wait, 0)
+            self.assertLessEqual(wait, min(api.API_BACKOFF_MAX,
+                                           api.API_BACKOFF_BASE * 2 ** attempt))
+
+    def test_retry_after(self):
+        self.assertEqual(api.backoff(0, {'Retry-After': '0.5'}, now=0), 0.5)
+        self.assertIsNone(api.backoff(0, {'Retry-After': '3600'}, now=0))
+
+    def test_retry_status(self):
+        self.assertTrue(api.retry_status('get', 502, 0))
+        self.assertTrue(api.retry_status('post', 503, 0))
+        self.assertTrue(api.retry_status('post', 429, 0))
+        self.assertFalse(api.retry_status('post', 502, 0))
+        self.assertFalse(api.retry_status('get', 500, 0))
+        self.assertFalse(api.retry_status('get', 503, api.API_RETRIES))
+
+    def test_throttled_beyond_cap(self):
+        limiter = api.RateLimiter(limit=30, period=60.0)
+        self.assertFalse(limiter.throttled({'Retry-After': '3600'}, cap=30))
+        self.assertEqual(limiter.reserve(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()